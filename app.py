@@ -1,29 +1,109 @@
+import multiprocessing
 import os
+import threading
+import time
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-from news_search_module import search_news
-from cluster import embed_articles, cluster_articles, analyze_clusters
+from news_search_module import search_news, project_fields, ARTICLE_FIELDS, CONTENT_MODES
+from cluster import embeddings_for_articles, cluster_articles, cluster_search_results, get_model, is_model_loaded
+from article_store import get_store
+from semantic_search import semantic_search
+from query_cache import QueryCache
+from jobs import JobManager, JobQueueFull
+from query_engine import parse_query
+from search_index import FACET_FIELDS
+from stories import current_stories
+from date_utils import parse_date
+from metrics import timed, timed_iter, render as render_metrics, REQUESTS
 import json
-import datetime
-from sentence_transformers import SentenceTransformer
-from collections import OrderedDict
-from apscheduler.schedulers.background import BackgroundScheduler
-from scraper import main as scrape_articles  # Assuming scrape_articles is the function in your scraper.py
 
 # Create Flask app
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
 CORS(app)
 
+# Cache of /search responses, dropped whenever a new snapshot is loaded
+search_cache = QueryCache(max_entries=256, ttl=300)
+
+# Process pool for clustering requested with async=true
+cluster_jobs = JobManager()
+
+# With debug=True the reloader imports this module in a watcher process and
+# again in the serving child (WERKZEUG_RUN_MAIN=true). Job pool processes
+# import it too and inherit WERKZEUG_RUN_MAIN, but unlike the serving process
+# they have a multiprocessing parent. Background work only starts in the
+# serving process.
+IS_SERVING_PROCESS = multiprocessing.parent_process() is None and (
+    __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+)
+
+# Scraping normally runs in its own process (worker.py) and the article store
+# picks up the snapshots it writes. Set NEWSAPI_EMBEDDED_SCRAPER=1 to run it
+# every 2 hours inside the web process instead.
+EMBEDDED_SCRAPER = os.environ.get('NEWSAPI_EMBEDDED_SCRAPER', '').lower() in ('1', 'true', 'yes')
+scheduler = None
+
+# The newest snapshot is loaded in the background right after startup.
+# NEWSAPI_WARMUP=all also loads the embedding model used by clustering and
+# semantic search; by default it is loaded by the first request that needs it.
+WARMUP_MODEL = os.environ.get('NEWSAPI_WARMUP', 'store').lower() == 'all'
+warmup_status = {"store_loaded": False, "error": None}
+
+# Seconds between warmup attempts while no snapshot can be loaded yet, e.g.
+# before the worker's first write
+WARMUP_RETRY_SECONDS = 10.0
+
+# Streamed responses are written in blocks of about this many characters,
+# not one WSGI write per encoder fragment or ndjson line
+STREAM_BLOCK_SIZE = 64 * 1024
+
 # Function to run the scraper every 2 hours
 def run_scraper():
     print("Running scraper...")
-    scrape_articles()  # Call your scraper function here
+    # The scraper's dependencies are only needed here
+    from scraper import main as scrape_articles
+    # The scraper runs in this process, so the new snapshot is published to the store directly
+    scrape_articles(precompute_embeddings=True, publish=True)
 
-# Set up scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(run_scraper, 'interval', hours=2)  # Run every 2 hours
-scheduler.start()
+def start_embedded_scraper():
+    """
+    Start the in-process scraper schedule once per process
+    """
+    global scheduler
+    if scheduler is None:
+        from apscheduler.schedulers.background import BackgroundScheduler
+        scheduler = BackgroundScheduler()
+        scheduler.add_job(run_scraper, 'interval', hours=2)  # Run every 2 hours
+        scheduler.start()
+
+def warm_up():
+    """
+    Load the newest snapshot, and the embedding model if WARMUP_MODEL is set.
+    Retried every WARMUP_RETRY_SECONDS until both are loaded.
+    """
+    while True:
+        try:
+            if not warmup_status["store_loaded"]:
+                with timed('warmup_store'):
+                    snapshot = get_store().current()
+                if snapshot is None:
+                    raise RuntimeError("No snapshot has been written yet")
+                warmup_status["store_loaded"] = True
+            if WARMUP_MODEL:
+                get_model()
+            warmup_status["error"] = None
+            return
+        except Exception as e:
+            # Only log when the reason changes, not on every retry
+            if warmup_status["error"] != str(e):
+                print(f"Error during warmup, retrying every {WARMUP_RETRY_SECONDS:g}s: {e}")
+            warmup_status["error"] = str(e)
+        time.sleep(WARMUP_RETRY_SECONDS)
+
+if IS_SERVING_PROCESS:
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+    if EMBEDDED_SCRAPER:
+        start_embedded_scraper()
 
 def organize_clustered_results(search_results, cluster_labels):
     """
@@ -57,6 +137,163 @@ def organize_clustered_results(search_results, cluster_labels):
     
     return clustered_results
 
+def clustered_response(search_results, cluster_labels, fields=None):
+    """
+    Organize search results into clusters and keep only the requested fields
+    """
+    final_results = organize_clustered_results(search_results, cluster_labels)
+    if "facets" in search_results:
+        final_results["facets"] = search_results["facets"]
+    if fields is not None:
+        for cluster_name, articles in final_results["clusters"].items():
+            final_results["clusters"][cluster_name] = [project_fields(article, fields) for article in articles]
+    return final_results
+
+def result_snapshot_paths(articles, all_snapshots, date_from=None, date_to=None):
+    """
+    Return the paths of the snapshots that search results were found in,
+    newest first, so clustering can use their precomputed embeddings.
+
+    Args:
+        articles (list): Search result entries
+        all_snapshots (bool): Whether every retained snapshot was searched
+        date_from (date, optional): Earliest publish date of the search
+        date_to (date, optional): Latest publish date of the search
+    """
+    store = get_store()
+    if all_snapshots:
+        snapshots = store.snapshots_in_range(date_from, date_to)
+    else:
+        snapshots = [store.current()]
+    links = {article["link"] for article in articles}
+    return [snapshot.path for snapshot in snapshots if snapshot is not None and not links.isdisjoint(snapshot.links)]
+
+def submit_cluster_job(cache_key, generation, search_results, fields, snapshot_paths):
+    """
+    Cluster search results on the process pool and return a 202 response with the job id.
+    Identical requests for the same snapshot generation share one job, and the
+    finished result is also stored in the search cache.
+    """
+    # Only what embedding needs is sent to the worker process
+    articles = [
+        {"title": article["title"], "summary": article["summary"], "link": article["link"]}
+        for article in search_results["articles"]
+    ]
+    
+    def on_done(cluster_labels):
+        final_results = clustered_response(search_results, cluster_labels, fields)
+        search_cache.put(cache_key, final_results, generation)
+        return final_results
+    
+    try:
+        job = cluster_jobs.submit(
+            (cache_key, generation),
+            cluster_search_results,
+            (articles, snapshot_paths),
+            on_done=on_done
+        )
+    except JobQueueFull as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 503
+    
+    response = job.to_dict()
+    response["status_url"] = f"/jobs/{job.id}"
+    # The pool could not take the job even after being replaced
+    if job.status == 'error':
+        return jsonify(response), 500
+    return jsonify(response), 202
+
+def parse_filter_params():
+    """
+    Parse the length and date filter query parameters shared by the search endpoints.
+    Raises ValueError if the length parameters are invalid.
+    """
+    min_length = int(request.args.get('min_length', 0))
+    max_length_input = request.args.get('max_length', 'infinity')
+    max_length = float('inf') if max_length_input.lower() in ['infinity', 'inf'] else int(max_length_input)
+    filter_date = request.args.get('filter_date')
+    return min_length, max_length, filter_date
+
+def parse_page_params():
+    """
+    Parse the offset, limit and fields query parameters.
+    Raises ValueError with a message suitable for the client if they are invalid.
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit_input = request.args.get('limit')
+        limit = int(limit_input) if limit_input not in (None, '') else None
+    except ValueError:
+        raise ValueError("Invalid pagination parameters. offset and limit must be integers.")
+    
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("Invalid pagination parameters. offset and limit must not be negative.")
+    
+    fields_input = request.args.get('fields')
+    fields = None
+    if fields_input:
+        fields = [field.strip() for field in fields_input.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in ARTICLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Invalid fields {unknown}. fields must be a comma-separated subset of {list(ARTICLE_FIELDS)}")
+    
+    return offset, limit, fields
+
+def parse_facet_params():
+    """
+    Parse the facets and facet_limit query parameters.
+    Raises ValueError with a message suitable for the client if they are invalid.
+    """
+    facets_input = request.args.get('facets')
+    facets = None
+    if facets_input:
+        facets = [facet.strip() for facet in facets_input.split(',') if facet.strip()]
+        unknown = [facet for facet in facets if facet not in FACET_FIELDS]
+        if unknown:
+            raise ValueError(f"Invalid facets {unknown}. facets must be a comma-separated subset of {list(FACET_FIELDS)}")
+    
+    try:
+        limit_input = request.args.get('facet_limit')
+        facet_limit = int(limit_input) if limit_input not in (None, '') else None
+    except ValueError:
+        raise ValueError("Invalid facet_limit. Must be an integer.")
+    if facet_limit is not None and facet_limit < 1:
+        raise ValueError("Invalid facet_limit. Must be at least 1.")
+    
+    return facets, facet_limit
+
+def join_blocks(fragments, size=STREAM_BLOCK_SIZE):
+    """
+    Join small string fragments into blocks of at least size characters
+    (except the last one)
+    """
+    block = []
+    length = 0
+    for fragment in fragments:
+        block.append(fragment)
+        length += len(fragment)
+        if length >= size:
+            yield ''.join(block)
+            block = []
+            length = 0
+    if block:
+        yield ''.join(block)
+
+def generate_ndjson(results):
+    """
+    Yield search results as newline-delimited JSON, one article per line.
+    Clustered articles carry the name of their cluster.
+    """
+    if "clusters" in results:
+        for cluster_name, articles in results["clusters"].items():
+            for article in articles:
+                yield json.dumps({"cluster": cluster_name, **article}, ensure_ascii=False) + '\n'
+    else:
+        for article in results["articles"]:
+            yield json.dumps(article, ensure_ascii=False) + '\n'
+
 @app.route('/search', methods=['GET'])
 def search_endpoint():
     """
@@ -67,19 +304,46 @@ def search_endpoint():
     sort_by = request.args.get('sort_by', 'date')
     sort_order = request.args.get('sort_order', 'desc')
     cluster_results = request.args.get('cluster', 'false').lower() == 'true'
+    search_content = request.args.get('search_content', 'false').lower() == 'true'
+    response_format = request.args.get('format', 'json').lower()
+    all_snapshots = request.args.get('all_snapshots', 'false').lower() == 'true'
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    query_mode = request.args.get('mode', 'literal').lower()
+    async_job = request.args.get('async', 'false').lower() == 'true'
+    content_mode = request.args.get('content', 'full').lower()
     
     # Parse length parameters
     try:
-        min_length = int(request.args.get('min_length', 0))
-        max_length_input = request.args.get('max_length', 'infinity')
-        max_length = float('inf') if max_length_input.lower() in ['infinity', 'inf'] else int(max_length_input)
-        filter_date = request.args.get('filter_date')
+        min_length, max_length, filter_date = parse_filter_params()
     except ValueError:
         return jsonify({
             "error": "Invalid length parameters. Must be integers or 'Infinity'.",
             "status": "error"
         }), 400
     
+    # Parse pagination, projection and facet parameters
+    try:
+        offset, limit, fields = parse_page_params()
+        facets, facet_limit = parse_facet_params()
+    except ValueError as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 400
+    
+    if response_format not in ['json', 'ndjson']:
+        return jsonify({
+            "error": "Invalid format. Must be 'json' or 'ndjson'.",
+            "status": "error"
+        }), 400
+    
+    if content_mode not in CONTENT_MODES:
+        return jsonify({
+            "error": f"Invalid content. Must be one of {list(CONTENT_MODES)}.",
+            "status": "error"
+        }), 400
+    
     # Validate search term
     if not search_term:
         return jsonify({
@@ -87,8 +351,23 @@ def search_endpoint():
             "status": "error"
         }), 400
     
+    # Validate the query syntax
+    if query_mode not in ['literal', 'boolean']:
+        return jsonify({
+            "error": "Invalid mode. Must be 'literal' or 'boolean'.",
+            "status": "error"
+        }), 400
+    if query_mode == 'boolean':
+        try:
+            parse_query(search_term)
+        except ValueError as e:
+            return jsonify({
+                "error": f"Invalid query: {str(e)}",
+                "status": "error"
+            }), 400
+    
     # Validate sort parameters
-    valid_sort_by = ['date', 'length']
+    valid_sort_by = ['date', 'length', 'relevance']
     valid_sort_order = ['asc', 'desc']
     
     if sort_by not in valid_sort_by or sort_order not in valid_sort_order:
@@ -98,39 +377,90 @@ def search_endpoint():
         }), 400
     
     try:
-        # Perform initial search
-        search_results = search_news(
-            search_term, 
-            sort_by=sort_by, 
-            sort_order=sort_order,
-            min_length=min_length, 
-            max_length=max_length,
-            filter_date=filter_date
+        # Serve hot queries from the cache until a new snapshot lands
+        store = get_store()
+        store.current()
+        generation = store.generation
+        range_from = parse_date(date_from) if date_from else None
+        range_to = parse_date(date_to) if date_to else None
+        cache_key = (
+            search_term, query_mode, sort_by, sort_order, min_length, max_length,
+            parse_date(filter_date) if filter_date else None,
+            cluster_results, search_content, all_snapshots, range_from, range_to,
+            offset, limit, tuple(fields) if fields else None,
+            tuple(facets) if facets else None, facet_limit, content_mode
         )
+        with timed('cache_lookup'):
+            final_results = search_cache.get(cache_key, generation)
+        cache_status = 'HIT' if final_results is not None else 'MISS'
         
-        # If clustering is requested and there are results
-        if cluster_results and search_results["articles"]:
-            # Prepare texts for embedding
-            texts = [
-                f"{article['title']} {article.get('summary', '')}"
-                for article in search_results["articles"]
-            ]
+        if final_results is None:
+            # Perform initial search
+            with timed('search'):
+                search_results = search_news(
+                    search_term, 
+                    sort_by=sort_by, 
+                    sort_order=sort_order,
+                    min_length=min_length, 
+                    max_length=max_length,
+                    filter_date=filter_date,
+                    search_content=search_content,
+                    all_snapshots=all_snapshots,
+                    date_from=date_from,
+                    date_to=date_to,
+                    query_mode=query_mode,
+                    facets=facets,
+                    facet_limit=facet_limit,
+                    content_mode=content_mode,
+                    # Clusters are built from every match, so only page plain results
+                    offset=0 if cluster_results else offset,
+                    limit=None if cluster_results else limit,
+                    fields=None if cluster_results else fields
+                )
+            
+            # Use the precomputed embeddings of every snapshot that contributed
+            # results, encoding only what is missing
+            if cluster_results and search_results["articles"]:
+                snapshot_paths = result_snapshot_paths(
+                    search_results["articles"], all_snapshots, range_from, range_to
+                )
+            
+            # Hand clustering to the process pool and answer right away
+            if cluster_results and async_job and search_results["articles"]:
+                return submit_cluster_job(cache_key, generation, search_results, fields, snapshot_paths)
             
-            # Generate embeddings
-            model = SentenceTransformer('roberta-base-nli-stsb-mean-tokens')
-            embeddings = model.encode(texts)
+            # If clustering is requested and there are results
+            if cluster_results and search_results["articles"]:
+                with timed('embed'):
+                    embeddings = embeddings_for_articles(
+                        search_results["articles"],
+                        snapshot_paths=snapshot_paths
+                    )
             
-            # Perform clustering
-            cluster_labels = cluster_articles(embeddings)
+                # Perform clustering
+                with timed('cluster'):
+                    cluster_labels = cluster_articles(embeddings)
             
-            # Organize results into clusters
-            final_results = organize_clustered_results(search_results, cluster_labels)
-        else:
-            final_results = search_results
+                # Organize results into clusters
+                final_results = clustered_response(search_results, cluster_labels, fields)
+            else:
+                final_results = search_results
+            
+            # Errors are not cached so the next request retries
+            if "error" not in final_results:
+                search_cache.put(cache_key, final_results, generation)
         
-        # Return results as JSON response
-        response_json = json.dumps(final_results, indent=2, ensure_ascii=False)
-        return Response(response_json, content_type='application/json')
+        # Stream one article per line
+        if response_format == 'ndjson':
+            return Response(
+                timed_iter('serialize', join_blocks(generate_ndjson(final_results))),
+                content_type='application/x-ndjson',
+                headers={"X-Total-Count": str(final_results["total_articles"]), "X-Cache": cache_status}
+            )
+        
+        # Return results as JSON response, encoded in blocks rather than one large string
+        encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+        return Response(timed_iter('serialize', join_blocks(encoder.iterencode(final_results))), content_type='application/json', headers={"X-Cache": cache_status})
     
     except Exception as e:
         # Handle any unexpected errors
@@ -139,6 +469,301 @@ def search_endpoint():
             "status": "error"
         }), 500
 
+@app.route('/article/<article_id>', methods=['GET'])
+def article_endpoint(article_id):
+    """
+    Flask endpoint returning one article, including its full_content, by the
+    article_id that /search returns with content=snippet or content=none
+    """
+    try:
+        article = get_store().find_article(article_id)
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 500
+    
+    if article is None:
+        return jsonify({
+            "error": f"Unknown article {article_id}",
+            "status": "error"
+        }), 404
+    
+    return jsonify(dict(article, article_id=article_id))
+
+@app.route('/facets', methods=['GET'])
+def facets_endpoint():
+    """
+    Flask endpoint counting the sources, authors and publish days of the
+    articles matching a query, without building any article entries
+    """
+    search_term = request.args.get('q', '').strip()
+    search_content = request.args.get('search_content', 'false').lower() == 'true'
+    all_snapshots = request.args.get('all_snapshots', 'false').lower() == 'true'
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    query_mode = request.args.get('mode', 'literal').lower()
+    
+    try:
+        min_length, max_length, filter_date = parse_filter_params()
+    except ValueError:
+        return jsonify({
+            "error": "Invalid length parameters. Must be integers or 'Infinity'.",
+            "status": "error"
+        }), 400
+    
+    try:
+        facets, facet_limit = parse_facet_params()
+    except ValueError as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 400
+    
+    if not search_term:
+        return jsonify({
+            "error": "No search term provided",
+            "status": "error"
+        }), 400
+    
+    if query_mode not in ['literal', 'boolean']:
+        return jsonify({
+            "error": "Invalid mode. Must be 'literal' or 'boolean'.",
+            "status": "error"
+        }), 400
+    
+    try:
+        store = get_store()
+        store.current()
+        generation = store.generation
+        facets = facets or list(FACET_FIELDS)
+        cache_key = (
+            'facets', search_term, query_mode, min_length, max_length,
+            parse_date(filter_date) if filter_date else None,
+            search_content, all_snapshots,
+            parse_date(date_from) if date_from else None,
+            parse_date(date_to) if date_to else None,
+            tuple(facets), facet_limit
+        )
+        with timed('cache_lookup'):
+            result = search_cache.get(cache_key, generation)
+        cache_status = 'HIT' if result is not None else 'MISS'
+        
+        if result is None:
+            # limit=0 counts the matches without building any article entries
+            with timed('search'):
+                search_results = search_news(
+                    search_term,
+                    min_length=min_length,
+                    max_length=max_length,
+                    filter_date=filter_date,
+                    search_content=search_content,
+                    all_snapshots=all_snapshots,
+                    date_from=date_from,
+                    date_to=date_to,
+                    query_mode=query_mode,
+                    limit=0,
+                    facets=facets,
+                    facet_limit=facet_limit
+                )
+            if "error" in search_results:
+                return jsonify({
+                    "error": search_results["error"],
+                    "status": "error"
+                }), 400 if search_results["error"].startswith("Invalid query") else 500
+            
+            result = {
+                "search_term": search_results["search_term"],
+                "total_articles": search_results["total_articles"],
+                "facets": search_results["facets"]
+            }
+            search_cache.put(cache_key, result, generation)
+        
+        response = jsonify(result)
+        response.headers["X-Cache"] = cache_status
+        return response
+    
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_endpoint(job_id):
+    """
+    Flask endpoint reporting the status of a clustering job, with its result once done
+    """
+    job = cluster_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "error": "Unknown or expired job",
+            "status": "error"
+        }), 404
+    
+    if job.status == 'pending':
+        return jsonify(job.to_dict()), 202
+    if job.status == 'error':
+        return jsonify(job.to_dict()), 500
+    return jsonify(job.to_dict())
+
+@app.route('/stories', methods=['GET'])
+def stories_endpoint():
+    """
+    Flask endpoint serving the story clusters maintained after each scrape
+    (see stories.py), most recently updated first
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 20))
+        min_size = int(request.args.get('min_size', 2))
+    except ValueError:
+        return jsonify({
+            "error": "Invalid parameters. offset, limit and min_size must be integers.",
+            "status": "error"
+        }), 400
+    
+    if offset < 0 or limit < 0 or min_size < 1:
+        return jsonify({
+            "error": "Invalid parameters. offset and limit must not be negative and min_size must be at least 1.",
+            "status": "error"
+        }), 400
+    
+    try:
+        with timed('stories'):
+            index = current_stories()
+            if index is None:
+                return jsonify({
+                    "error": "No stories yet. Stories are built by scrapes with precomputed embeddings (--embed).",
+                    "status": "error"
+                }), 404
+            total, stories = index.stories(min_size=min_size, offset=offset, limit=limit)
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 500
+    
+    return jsonify({
+        "total_stories": total,
+        "offset": offset,
+        "limit": limit,
+        "stories": stories
+    })
+
+@app.route('/semantic_search', methods=['GET'])
+def semantic_search_endpoint():
+    """
+    Flask endpoint for searching news articles by meaning using precomputed embeddings
+    """
+    query = request.args.get('q', '').strip()
+    sort_by = request.args.get('sort_by', 'relevance')
+    sort_order = request.args.get('sort_order', 'desc')
+    
+    try:
+        k = int(request.args.get('k', 20))
+        min_length, max_length, filter_date = parse_filter_params()
+    except ValueError:
+        return jsonify({
+            "error": "Invalid k or length parameters. Must be integers or 'Infinity'.",
+            "status": "error"
+        }), 400
+    
+    if not query:
+        return jsonify({
+            "error": "No search term provided",
+            "status": "error"
+        }), 400
+    
+    valid_sort_by = ['relevance', 'date', 'length']
+    valid_sort_order = ['asc', 'desc']
+    
+    if sort_by not in valid_sort_by or sort_order not in valid_sort_order:
+        return jsonify({
+            "error": f"Invalid sort parameters. sort_by must be one of {valid_sort_by} and sort_order must be one of {valid_sort_order}",
+            "status": "error"
+        }), 400
+    
+    try:
+        results = semantic_search(
+            query,
+            k=k,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            min_length=min_length,
+            max_length=max_length,
+            filter_date=filter_date
+        )
+        response_json = json.dumps(results, indent=2, ensure_ascii=False)
+        return Response(response_json, content_type='application/json')
+    
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 500
+
+@app.after_request
+def count_request(response):
+    """
+    Count every handled request by endpoint and status code
+    """
+    REQUESTS.inc(endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Flask endpoint exposing timings and counters in Prometheus text format
+    """
+    stats = search_cache.stats()
+    cache_lines = [
+        '# HELP newsapi_search_cache_hits_total /search responses served from the cache',
+        '# TYPE newsapi_search_cache_hits_total counter',
+        f'newsapi_search_cache_hits_total {stats["hits"]}',
+        '# HELP newsapi_search_cache_misses_total /search responses that had to be computed',
+        '# TYPE newsapi_search_cache_misses_total counter',
+        f'newsapi_search_cache_misses_total {stats["misses"]}',
+        '# HELP newsapi_search_cache_entries Entries currently in the /search cache',
+        '# TYPE newsapi_search_cache_entries gauge',
+        f'newsapi_search_cache_entries {stats["entries"]}'
+    ]
+    return Response(render_metrics(cache_lines), content_type='text/plain; version=0.0.4')
+
+@app.route('/ready', methods=['GET'])
+def ready_endpoint():
+    """
+    Flask endpoint for readiness probes.
+    Returns 200 once the newest snapshot is loaded (and the embedding model,
+    when NEWSAPI_WARMUP=all), 503 until then. Warmup keeps retrying in the
+    background, so the probe turns ready without a restart.
+    """
+    snapshot = get_store().current() if warmup_status["store_loaded"] else None
+    store_loaded = snapshot is not None
+    model_loaded = is_model_loaded()
+    ready = store_loaded and (model_loaded or not WARMUP_MODEL)
+    
+    return jsonify({
+        "ready": ready,
+        "store": {
+            "loaded": store_loaded,
+            "snapshot": snapshot.path if snapshot else None,
+            "articles": len(snapshot.articles) if snapshot else 0
+        },
+        "model": {
+            "loaded": model_loaded,
+            "required": WARMUP_MODEL
+        },
+        "error": warmup_status["error"]
+    }), 200 if ready else 503
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats_endpoint():
+    """
+    Flask endpoint reporting hit/miss counters of the /search response cache
+    """
+    return jsonify(search_cache.stats())
+
 def main():
     # Ensure scrapes directory exists
     os.makedirs('scrapes', exist_ok=True)
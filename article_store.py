@@ -0,0 +1,418 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from date_utils import parse_date
+from search_index import InvertedIndex, DateIndex, FacetIndex
+from snapshot_format import (COMPACT_SUFFIX, CONTENT_SUFFIX, LEGACY_SUFFIX, content_length, is_snapshot_file,
+                             iter_articles, load_articles_lazy, read_article, snapshot_base)
+
+# Number of older snapshots kept in memory for multi-snapshot searches
+MAX_CACHED_SNAPSHOTS = 16
+
+# Searches over every snapshot without a date range only read the newest
+# ones, so they are always served from memory
+MAX_UNRANGED_SNAPSHOTS = MAX_CACHED_SNAPSHOTS
+
+# Snapshots older than this, or beyond the newest MAX_RETAINED_SNAPSHOTS, are
+# deleted by prune_snapshots after each scrape
+SNAPSHOT_RETENTION_SECONDS = 7 * 24 * 3600
+MAX_RETAINED_SNAPSHOTS = 168
+
+# Files stored next to a snapshot under its base name: both formats, the
+# content blob, the manifest and the embedding sidecars (cluster.embedding_paths)
+SNAPSHOT_FILE_SUFFIXES = (COMPACT_SUFFIX, LEGACY_SUFFIX, CONTENT_SUFFIX, '.meta.json', '.emb.npy', '.emb.json')
+
+def article_id(link):
+    """
+    Return the short stable id of an article, a hash of its link.
+    Search results carry it so full_content can be fetched from /article/<id> later.
+    """
+    return hashlib.sha1(link.encode('utf-8')).hexdigest()[:16]
+
+class Snapshot:
+    """
+    An immutable, loaded scrape snapshot.
+
+    Snapshots loaded from disk keep their articles without full_content
+    (see snapshot_format.load_articles_lazy); content(doc_id) reads a body
+    from the blob segment when a search needs it.
+
+    Attributes:
+        path (str): Path of the snapshot file
+        mtime (float): Modification time of the file when it was loaded
+        articles (list): Article dictionaries in file order
+        contents (SnapshotContents): Reader of the articles' full_content,
+            or None when the articles carry it themselves
+        content_lengths (list): Length of each article's full_content
+        index (InvertedIndex): Whole-word search index over the articles
+        links (set): Links of all articles in the snapshot, including the
+            alternate links of collapsed duplicates
+        date_index (DateIndex): Parsed and sorted publish dates
+        facets (FacetIndex): Precomputed source, author and day counts
+    """
+    def __init__(self, path, mtime, articles, contents=None):
+        self.path = path
+        self.mtime = mtime
+        self.articles = articles
+        self.contents = contents
+        self.content_lengths = [content_length(article) for article in articles]
+        self.index = InvertedIndex(articles, readers={'full_content': contents.read} if contents is not None else None)
+        self.links = {article.get('link', '') for article in articles}
+        for article in articles:
+            self.links.update(article.get('alternate_links', ()))
+        self.date_index = DateIndex(articles)
+        self.facets = FacetIndex(articles, self.date_index.dates)
+        self._doc_ids = None
+
+    @classmethod
+    def load(cls, path, mtime):
+        """
+        Load a snapshot file without its article bodies
+        """
+        articles, contents = load_articles_lazy(path)
+        return cls(path, mtime, articles, contents)
+
+    def content(self, doc_id):
+        """
+        Return the full_content of an article, as stored
+        """
+        return self.index.field_value(doc_id, 'full_content')
+
+    def article(self, doc_id):
+        """
+        Return a copy of an article with its full_content
+        """
+        article = dict(self.articles[doc_id], full_content=self.content(doc_id))
+        article.pop('content_length', None)
+        return article
+
+    def find(self, target_id):
+        """
+        Return the document id of the article with the given article_id, or None
+        """
+        if self._doc_ids is None:
+            self._doc_ids = {article_id(article.get('link', '')): doc_id for doc_id, article in enumerate(self.articles)}
+        return self._doc_ids.get(target_id)
+
+
+def list_snapshots(scrapes_dir='scrapes'):
+    """
+    Return (path, mtime) of every snapshot in a directory, newest first.
+    When a snapshot exists in both formats only the compact file is listed.
+    Files deleted while the directory is read are left out.
+    """
+    by_base = {}
+    for name in os.listdir(scrapes_dir):
+        if not is_snapshot_file(name):
+            continue
+        path = os.path.join(scrapes_dir, name)
+        base = snapshot_base(path)
+        if base not in by_base or path.endswith(COMPACT_SUFFIX):
+            by_base[base] = path
+    snapshots = []
+    for path in by_base.values():
+        try:
+            snapshots.append((path, os.path.getmtime(path)))
+        except OSError:
+            continue
+    snapshots.sort(key=lambda snapshot: snapshot[1], reverse=True)
+    return snapshots
+
+def prune_snapshots(scrapes_dir='scrapes', max_age=SNAPSHOT_RETENTION_SECONDS,
+                    max_snapshots=MAX_RETAINED_SNAPSHOTS, now=None):
+    """
+    Delete snapshots older than max_age seconds or beyond the newest
+    max_snapshots, together with every file stored next to them.
+    The newest snapshot is always kept.
+
+    Returns:
+        list: Paths of the deleted snapshots
+    """
+    now = now if now is not None else time.time()
+    deleted = []
+    for position, (path, mtime) in enumerate(list_snapshots(scrapes_dir)):
+        if position == 0 or (position < max_snapshots and now - mtime <= max_age):
+            continue
+        base = snapshot_base(path)
+        for suffix in SNAPSHOT_FILE_SUFFIXES:
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+        deleted.append(path)
+    if deleted:
+        print(f"Deleted {len(deleted)} snapshots beyond the retention window")
+    return deleted
+
+def manifest_path(snapshot_path):
+    """
+    Return the path of the manifest sidecar of a snapshot
+    """
+    return snapshot_base(snapshot_path) + '.meta.json'
+
+def build_manifest(articles):
+    """
+    Summarize a snapshot so it can be pruned or searched for an article
+    without being loaded.
+
+    Returns:
+        dict: Article count, the span of parseable publish dates and the
+              article_id of each article in file order
+    """
+    dates = [parse_date(article.get('published_date', '')) for article in articles]
+    dated = [article_date for article_date in dates if article_date]
+    return {
+        "articles": len(articles),
+        "min_date": min(dated).isoformat() if dated else None,
+        "max_date": max(dated).isoformat() if dated else None,
+        "undated": len(dates) - len(dated),
+        "article_ids": [article_id(article.get('link', '')) for article in articles]
+    }
+
+def write_manifest(snapshot_path, articles):
+    """
+    Write the manifest sidecar of a snapshot and return it
+    """
+    manifest = build_manifest(articles)
+    path = manifest_path(snapshot_path)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+def manifest_overlaps(manifest, date_from=None, date_to=None):
+    """
+    Tell whether a snapshot can hold articles published between date_from and date_to
+    """
+    if manifest["min_date"] is None:
+        return False
+    if date_from is not None and date.fromisoformat(manifest["max_date"]) < date_from:
+        return False
+    if date_to is not None and date.fromisoformat(manifest["min_date"]) > date_to:
+        return False
+    return True
+
+
+class ArticleStore:
+    """
+    Process-wide, in-memory view of the newest scrape snapshot.
+
+    The newest file in the scrapes directory is loaded once and served from
+    memory. New snapshots are picked up either when the scraper announces
+    them through publish(), or by a cheap mtime check that runs at most once
+    every poll_interval seconds. The current snapshot is replaced with a
+    single reference assignment, so readers always see either the old or the
+    new snapshot, never a partially loaded one.
+
+    generation is incremented every time a new snapshot is swapped in, so
+    caches derived from the store can tell when they are stale.
+    """
+    def __init__(self, scrapes_dir='scrapes', poll_interval=5.0):
+        self.scrapes_dir = scrapes_dir
+        self.poll_interval = poll_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._manifests = {}
+
+    def _find_newest(self):
+        """
+        Return (path, mtime) of the most recently modified snapshot, or None
+        """
+        snapshots = list_snapshots(self.scrapes_dir)
+        return snapshots[0] if snapshots else None
+
+    def snapshot_paths(self):
+        """
+        Return the paths of all retained snapshots, newest first.
+        When a snapshot exists in both formats only the compact file is listed.
+        Snapshots deleted by prune_snapshots are dropped from the caches.
+        """
+        paths = [path for path, _ in list_snapshots(self.scrapes_dir)]
+        retained = set(paths)
+        with self._lock:
+            for path in [path for path in self._cache if path not in retained]:
+                del self._cache[path]
+            for path in [path for path in self._manifests if path not in retained]:
+                del self._manifests[path]
+        return paths
+
+    def current(self):
+        """
+        Return the current Snapshot, loading or refreshing it if needed.
+
+        Returns:
+            Snapshot: The newest snapshot, or None if no snapshot exists
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.poll_interval:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._snapshot is not None and time.monotonic() - self._last_check < self.poll_interval:
+                return self._snapshot
+
+            newest = self._find_newest()
+            self._last_check = time.monotonic()
+            if newest is None:
+                return self._snapshot
+
+            path, mtime = newest
+            snapshot = self._snapshot
+            if snapshot is None or os.path.abspath(path) != os.path.abspath(snapshot.path) or mtime != snapshot.mtime:
+                try:
+                    self._snapshot = Snapshot.load(path, mtime)
+                    self.generation += 1
+                except ValueError:
+                    # Keep serving the previous snapshot if the new file is unreadable
+                    if snapshot is None:
+                        raise
+            return self._snapshot
+
+    def get_snapshot(self, path):
+        """
+        Return the Snapshot for any retained snapshot file.
+        Older snapshots are loaded on demand and kept in a small LRU cache.
+        """
+        mtime = os.path.getmtime(path)
+        current = self._snapshot
+        if current is not None and current.path == path and current.mtime == mtime:
+            return current
+
+        with self._lock:
+            snapshot = self._cache.get(path)
+            if snapshot is not None and snapshot.mtime == mtime:
+                self._cache.move_to_end(path)
+                return snapshot
+
+        snapshot = Snapshot.load(path, mtime)
+        with self._lock:
+            self._cache[path] = snapshot
+            self._cache.move_to_end(path)
+            while len(self._cache) > MAX_CACHED_SNAPSHOTS:
+                self._cache.popitem(last=False)
+        return snapshot
+
+    def get_manifest(self, path):
+        """
+        Return the manifest of a snapshot, building the sidecar if it is
+        missing or was written before manifests recorded article ids
+        """
+        mtime = os.path.getmtime(path)
+        cached = self._manifests.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with open(manifest_path(path), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if "article_ids" not in manifest:
+                raise ValueError("manifest has no article ids")
+        except (OSError, ValueError):
+            with self._lock:
+                snapshot = self._cache.get(path)
+            # Without a loaded copy, stream the articles without their bodies
+            articles = snapshot.articles if snapshot is not None else list(iter_articles(path, with_content=False))
+            try:
+                manifest = write_manifest(path, articles)
+            except OSError:
+                manifest = build_manifest(articles)
+
+        with self._lock:
+            self._manifests[path] = (mtime, manifest)
+        return manifest
+
+    def snapshots_in_range(self, date_from=None, date_to=None):
+        """
+        Return the Snapshots that can hold articles in a publish date range, newest first.
+
+        Snapshots whose manifest shows no dates inside the range are skipped
+        without being loaded. With no range, only the newest
+        MAX_UNRANGED_SNAPSHOTS snapshots are returned, so the query never
+        loads and indexes older history.
+        """
+        paths = self.snapshot_paths()
+        if date_from is not None or date_to is not None:
+            paths = [path for path in paths if manifest_overlaps(self.get_manifest(path), date_from, date_to)]
+        else:
+            paths = paths[:MAX_UNRANGED_SNAPSHOTS]
+        return [self.get_snapshot(path) for path in paths]
+
+    def find_article(self, target_id):
+        """
+        Find an article by its article_id, in the current snapshot first and
+        then in the older retained snapshots, newest first.
+
+        Older snapshots are looked up in their manifests, so only the one
+        article is read from disk and no snapshot is loaded or indexed.
+
+        Returns:
+            dict: The article, or None if no retained snapshot holds it
+        """
+        current = self.current()
+        if current is not None:
+            doc_id = current.find(target_id)
+            if doc_id is not None:
+                return current.article(doc_id)
+
+        for path in self.snapshot_paths():
+            if current is not None and path == current.path:
+                continue
+            try:
+                article_ids = self.get_manifest(path)["article_ids"]
+            except OSError:
+                # Pruned while the snapshots were listed
+                continue
+            if target_id not in article_ids:
+                continue
+            try:
+                article = read_article(path, article_ids.index(target_id))
+            except OSError:
+                continue
+            if article is not None:
+                return article
+        return None
+
+    def publish(self, path):
+        """
+        Swap in a newly written snapshot.
+
+        The file is read back without article bodies, like any snapshot the
+        store loads, rather than keeping the scraper's copies in memory.
+
+        Args:
+            path (str): Path of the snapshot file that was just written
+        """
+        snapshot = Snapshot.load(path, os.path.getmtime(path))
+        with self._lock:
+            self._snapshot = snapshot
+            self._last_check = time.monotonic()
+            self.generation += 1
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """
+    Return the process-wide ArticleStore, creating it on first use
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArticleStore()
+    return _store
+
+def notify_snapshot_saved(path):
+    """
+    Tell the process-wide store that the scraper wrote a new snapshot
+    """
+    get_store().publish(path)
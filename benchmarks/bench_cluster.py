@@ -0,0 +1,60 @@
+"""
+Benchmark the clustering engines in cluster.py on synthetic embeddings.
+
+Compares the blocked radius-graph engine ('radius') with DBSCAN over cosine
+('brute') for growing numbers of articles and prints one JSON object per run.
+
+Usage:
+    python benchmarks/bench_cluster.py --sizes 100 1000 10000 50000 --max-brute 20000
+"""
+import argparse
+import time
+import numpy as np
+
+from common import emit
+from cluster import cluster_articles
+
+def synthetic_embeddings(n, dim=768, story_size=20, noise=0.35, seed=0):
+    """
+    Generate n embeddings grouped around n / story_size random story centers
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // story_size), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=n)
+    return centers[labels] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+
+def run(sizes=(100, 1000, 5000, 10000, 20000, 50000), max_brute=20000, dim=768, repeat=1):
+    # Warm up imports and BLAS so the first size is not penalized
+    for method in ('radius', 'brute'):
+        cluster_articles(synthetic_embeddings(50, dim=dim), method=method)
+
+    for n in sizes:
+        embeddings = synthetic_embeddings(n, dim=dim)
+        labels = {}
+        for method in ('radius', 'brute'):
+            if method == 'brute' and n > max_brute:
+                continue
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                labels[method] = cluster_articles(embeddings, method=method)
+                timings.append(time.perf_counter() - start)
+            emit({
+                "benchmark": "cluster_articles",
+                "method": method,
+                "n": n,
+                "dim": dim,
+                "seconds": min(timings),
+                "clusters": int(len(set(labels[method])) - (1 if -1 in labels[method] else 0))
+            })
+        if len(labels) == 2 and not np.array_equal(labels['radius'], labels['brute']):
+            emit({"benchmark": "cluster_articles", "n": n, "error": "labels differ"})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000, 10000, 20000, 50000])
+    parser.add_argument('--max-brute', type=int, default=20000, help="Largest N to run the brute-force path on")
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+    run(args.sizes, args.max_brute, args.dim, args.repeat)
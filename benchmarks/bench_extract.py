@@ -0,0 +1,89 @@
+"""
+Benchmark article text extraction in pages per second.
+
+Compares the lxml extractor (extractor.extract_text) with the original
+BeautifulSoup html.parser extraction (extractor.extract_text_bs4) on
+synthetic news pages, checks that both return the same text, and measures
+parallel re-extraction of a temporary raw page archive.
+
+Usage:
+    python benchmarks/bench_extract.py --pages 200 --workers 1 4
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from common import emit
+import extractor
+
+WORDS = ("government minister election market india world report police court city "
+         "health climate trade team match film season price rate growth water").split()
+
+def sentence(rng, words=18):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def news_page(rng, index):
+    """
+    A page shaped like a real news site: head scripts, navigation, teaser
+    lists, the article container and a footer with more links
+    """
+    nav = ''.join(f"<li><a href='/section/{i}'>{rng.choice(WORDS)}</a></li>" for i in range(40))
+    teasers = ''.join(
+        f"<div class='teaser'><a href='/story/{i}'><img src='/img/{i}.jpg'/><span>{sentence(rng, 8)}</span></a></div>"
+        for i in range(30)
+    )
+    paragraphs = ''.join(f"<p>{sentence(rng)} {sentence(rng)} <a href='/t/{i}'>{rng.choice(WORDS)}</a></p>"
+                         for i in range(rng.randint(8, 25)))
+    # Rotate through the layouts the strategies are written for
+    layout = index % 4
+    if layout == 0:
+        body = f"<article><h1>{sentence(rng, 8)}</h1>{paragraphs}</article>"
+    elif layout == 1:
+        body = f"<div class='story-Content main'><h1>{sentence(rng, 8)}</h1>{paragraphs}</div>"
+    elif layout == 2:
+        body = f"<div class='article-body'>{paragraphs}</div>"
+    else:
+        body = f"<section>{paragraphs}</section>"
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Story</title>"
+        f"<script>window.dataLayer = [{{'page': {index}}}];</script><style>.nav {{ color: red }}</style></head>"
+        f"<body><header><ul class='nav'>{nav}</ul></header><main>{teasers}{body}</main>"
+        f"<!-- ad slot --><footer><ul>{nav}</ul><script>trackPage();</script></footer></body></html>"
+    ).encode('utf-8')
+
+def pages_per_second(func, pages):
+    start = time.perf_counter()
+    results = [func(page) for page in pages]
+    seconds = time.perf_counter() - start
+    return results, seconds, len(pages) / seconds
+
+def run(pages=200, workers=(1, 4), seed=0):
+    rng = random.Random(seed)
+    corpus = [news_page(rng, i) for i in range(pages)]
+    common = {"pages": pages, "bytes": sum(len(page) for page in corpus)}
+
+    reference, seconds, rate = pages_per_second(extractor.extract_text_bs4, corpus)
+    emit(dict(common, benchmark="extract_bs4_html_parser", seconds=seconds, pages_per_second=rate))
+
+    fast, seconds, fast_rate = pages_per_second(extractor.extract_text, corpus)
+    emit(dict(common, benchmark="extract_lxml", seconds=seconds, pages_per_second=fast_rate,
+              speedup=fast_rate / rate, mismatches=sum(1 for a, b in zip(reference, fast) if a != b)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = extractor.RawPageArchive(directory)
+        for i, page in enumerate(corpus):
+            archive.store(f"http://bench.local/story/{i}", page, 'text/html; charset=utf-8')
+        for count in workers:
+            start = time.perf_counter()
+            contents = extractor.reextract_archive(archive, workers=count)
+            seconds = time.perf_counter() - start
+            emit(dict(common, benchmark="reextract_archive", workers=count, seconds=seconds,
+                      pages_per_second=len(contents) / seconds))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+    run(args.pages, tuple(args.workers))
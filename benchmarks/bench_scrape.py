@@ -0,0 +1,129 @@
+"""
+Benchmark the scraper against a local HTTP server.
+
+The server serves canned RSS feeds at /feed/<k>.xml and article pages at
+/article/<k>/<i>.html, with an optional per-request latency to mimic real
+sites. Nothing leaves the machine, so runs are reproducible.
+
+Usage:
+    python benchmarks/bench_scrape.py --feeds 10 --articles-per-feed 20 --latency 0.05
+"""
+import argparse
+import contextlib
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import emit
+import scraper
+
+PARAGRAPH = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8 + "</p>"
+
+def article_html(feed, index):
+    return (
+        f"<html><head><title>Article {feed}-{index}</title></head><body>"
+        f"<nav><a href='/'>Home</a></nav>"
+        f"<article><h1>Article {feed}-{index}</h1>{PARAGRAPH * 12}</article>"
+        f"<footer>Footer</footer></body></html>"
+    )
+
+def feed_xml(base_url, feed, articles_per_feed):
+    items = ''.join(
+        f"<item><title>Story {feed}-{i} about india</title>"
+        f"<link>{base_url}/article/{feed}/{i}.html</link>"
+        f"<description>Summary of story {feed}-{i}</description>"
+        f"<pubDate>{formatdate(1737950000 + i * 60)}</pubDate>"
+        f"<author>desk@example.com (News Desk)</author></item>"
+        for i in range(articles_per_feed)
+    )
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?><rss version='2.0'><channel>"
+        f"<title>Feed {feed}</title><link>{base_url}</link>{items}</channel></rss>"
+    )
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, articles_per_feed, latency):
+        super().__init__(('127.0.0.1', 0), BenchHandler)
+        self.articles_per_feed = articles_per_feed
+        self.latency = latency
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+
+class BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        parts = self.path.strip('/').split('/')
+        if parts[0] == 'feed':
+            body = feed_xml(server.base_url, parts[1].split('.')[0], server.articles_per_feed)
+            content_type = 'application/rss+xml'
+        elif parts[0] == 'article' and len(parts) == 3:
+            body = article_html(parts[1], parts[2].split('.')[0])
+            content_type = 'text/html'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def timed_call(func, *args):
+    start = time.perf_counter()
+    # The scraper reports progress with print; keep stdout for JSON Lines
+    with contextlib.redirect_stdout(sys.stderr):
+        result = func(*args)
+    return result, time.perf_counter() - start
+
+def run(feeds=10, articles_per_feed=20, latency=0.05):
+    # Measure downloads and extraction only, without filling scrapes/raw
+    scraper.ARCHIVE_RAW_PAGES = False
+    server = BenchServer(articles_per_feed, latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        feed_urls = [f"{server.base_url}/feed/{k}.xml" for k in range(feeds)]
+        article_urls = [
+            f"{server.base_url}/article/{k}/{i}.html"
+            for k in range(feeds) for i in range(articles_per_feed)
+        ]
+        common = {"feeds": feeds, "articles_per_feed": articles_per_feed, "latency": latency}
+
+        sample = article_urls[:min(len(article_urls), 20)]
+        _, seconds = timed_call(lambda urls: [scraper.extract_full_content(url) for url in urls], sample)
+        emit(dict(common, benchmark="extract_full_content_sequential", pages=len(sample),
+                  seconds=seconds, pages_per_second=len(sample) / seconds))
+
+        contents, seconds = timed_call(scraper.fetch_full_contents, article_urls)
+        emit(dict(common, benchmark="fetch_full_contents", pages=len(article_urls),
+                  seconds=seconds, pages_per_second=len(article_urls) / seconds,
+                  failures=sum(1 for content in contents if content.startswith('Error'))))
+
+        articles, seconds = timed_call(scraper.scrape_rss_feed, feed_urls[0])
+        emit(dict(common, benchmark="scrape_rss_feed", articles=len(articles), seconds=seconds))
+
+        articles, seconds = timed_call(scraper.scrape_multiple_feeds, feed_urls)
+        emit(dict(common, benchmark="scrape_multiple_feeds", articles=len(articles), seconds=seconds,
+                  articles_per_second=len(articles) / seconds))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--feeds', type=int, default=10)
+    parser.add_argument('--articles-per-feed', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds of delay per request')
+    args = parser.parse_args()
+    run(args.feeds, args.articles_per_feed, args.latency)
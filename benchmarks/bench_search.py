@@ -0,0 +1,121 @@
+"""
+Benchmark search_news over the committed corpus and synthetic corpora.
+
+For each corpus the snapshot is written in the compact format, published to
+the article store (which builds the indexes) and then queried repeatedly.
+Prints one JSON object per (corpus, query) pair.
+
+Usage:
+    python benchmarks/bench_search.py --sizes 10000 100000 --repeat 20
+"""
+import argparse
+import contextlib
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import REPO_ROOT, emit, summarize
+from article_store import get_store
+from news_search_module import search_news
+from snapshot_format import load_articles, write_snapshot
+
+QUERIES = [
+    {"q": "india"},
+    {"q": "the"},
+    {"q": "new delhi"},
+    {"q": "covid-19"},
+    {"q": "zzzznotaword"},
+    {"q": "india", "sort_by": "length"},
+    {"q": "india", "filter_date": "2025-01-27"},
+    {"q": "india", "search_content": True},
+]
+
+def committed_corpus():
+    """
+    Load the articles of every committed snapshot, deduplicated by link
+    """
+    articles = {}
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, 'scrapes', '*.json'))):
+        if path.endswith('.emb.json') or path.endswith('.meta.json'):
+            continue
+        for article in load_articles(path):
+            articles.setdefault(article.get('link', ''), article)
+    return list(articles.values())
+
+def synthetic_corpus(templates, n, seed=0):
+    """
+    Build n articles by recombining the committed ones.
+
+    Each synthetic article takes its fields from a random template, gets a
+    unique link and a few extra words so token statistics stay realistic.
+    """
+    rng = random.Random(seed)
+    vocabulary = sorted({word for article in templates for word in str(article.get('title', '')).split()})
+    articles = []
+    for i in range(n):
+        template = templates[rng.randrange(len(templates))]
+        article = dict(template)
+        extra = ' '.join(rng.choice(vocabulary) for _ in range(3))
+        article['title'] = f"{template.get('title', '')} {extra}"
+        article['link'] = f"{template.get('link', '')}#synthetic-{i}"
+        articles.append(article)
+    return articles
+
+def bench_corpus(name, articles, repeat, workdir):
+    """
+    Publish a corpus to the article store and time every query against it
+    """
+    path = os.path.join(workdir, 'scrapes', f'articles_{name}.jsonl.gz')
+    write_snapshot(path, articles)
+
+    start = time.perf_counter()
+    # Library progress output goes to stderr so stdout stays JSON Lines
+    with contextlib.redirect_stdout(sys.stderr):
+        get_store().publish(path)
+    emit({
+        "benchmark": "search_index_build",
+        "corpus": name,
+        "articles": len(articles),
+        "seconds": time.perf_counter() - start
+    })
+
+    for query in QUERIES:
+        params = dict(query)
+        term = params.pop("q")
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = search_news(term, **params)
+            timings.append(time.perf_counter() - start)
+        emit(dict({
+            "benchmark": "search_news",
+            "corpus": name,
+            "articles": len(articles),
+            "query": query,
+            "matches": result["total_articles"]
+        }, **summarize(timings)))
+
+def run(sizes=(10000, 100000), repeat=10):
+    templates = committed_corpus()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'scrapes'))
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            corpora = [("committed", templates)] + [
+                (f"synthetic_{n}", synthetic_corpus(templates, n)) for n in sizes
+            ]
+            for name, articles in corpora:
+                bench_corpus(name, articles, repeat, workdir)
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
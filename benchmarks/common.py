@@ -0,0 +1,64 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark prints one JSON object per measurement (JSON Lines) so runs
+can be stored and compared to catch regressions.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+_commit = None
+
+def git_commit():
+    """
+    Return the current git commit of the repository, or None outside a checkout
+    """
+    global _commit
+    if _commit is None:
+        try:
+            _commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=REPO_ROOT, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            _commit = ''
+    return _commit or None
+
+def emit(record, output=None):
+    """
+    Print a benchmark record as one JSON line, tagged with run metadata
+    """
+    record = dict(record)
+    record.setdefault("commit", git_commit())
+    record.setdefault("python", platform.python_version())
+    record.setdefault("timestamp", time.strftime('%Y-%m-%dT%H:%M:%S'))
+    print(json.dumps(record), file=output or sys.stdout, flush=True)
+
+def percentile(values, fraction):
+    """
+    Return the value at the given fraction (0..1) of the sorted values
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(timings):
+    """
+    Summarize a list of durations in seconds
+    """
+    return {
+        "runs": len(timings),
+        "min_seconds": min(timings),
+        "p50_seconds": percentile(timings, 0.5),
+        "p95_seconds": percentile(timings, 0.95),
+        "mean_seconds": sum(timings) / len(timings)
+    }
@@ -0,0 +1,58 @@
+"""
+Run every benchmark and collect the results as JSON Lines.
+
+Usage:
+    python benchmarks/run_all.py --output results/$(git rev-parse --short HEAD).jsonl
+    python benchmarks/run_all.py --quick
+"""
+import argparse
+import contextlib
+import sys
+
+import bench_cluster
+import bench_extract
+import bench_scrape
+import bench_search
+
+PROFILES = {
+    "full": {
+        "search": {"sizes": (10000, 100000), "repeat": 20},
+        "cluster": {"sizes": (100, 1000, 5000, 10000, 20000, 50000), "max_brute": 20000},
+        "scrape": {"feeds": 20, "articles_per_feed": 25, "latency": 0.05},
+        "extract": {"pages": 1000, "workers": (1, 4)},
+    },
+    "quick": {
+        "search": {"sizes": (10000,), "repeat": 5},
+        "cluster": {"sizes": (100, 1000, 5000), "max_brute": 5000},
+        "scrape": {"feeds": 4, "articles_per_feed": 10, "latency": 0.02},
+        "extract": {"pages": 100, "workers": (2,)},
+    },
+}
+
+def run(profile="full", only=None):
+    settings = PROFILES[profile]
+    runners = {
+        "search": bench_search.run,
+        "cluster": bench_cluster.run,
+        "scrape": bench_scrape.run,
+        "extract": bench_extract.run,
+    }
+    for name, runner in runners.items():
+        if only and name not in only:
+            continue
+        print(f"Running {name} benchmarks", file=sys.stderr)
+        runner(**settings[name])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes for a fast smoke run')
+    parser.add_argument('--only', nargs='+', choices=['search', 'cluster', 'scrape', 'extract'])
+    parser.add_argument('--output', help='Append results to this file instead of stdout')
+    args = parser.parse_args()
+
+    profile = "quick" if args.quick else "full"
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as output, contextlib.redirect_stdout(output):
+            run(profile, args.only)
+    else:
+        run(profile, args.only)
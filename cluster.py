@@ -1,8 +1,127 @@
 import json
+import os
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
-from sklearn.cluster import DBSCAN
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from article_store import MAX_RETAINED_SNAPSHOTS, list_snapshots
+from snapshot_format import snapshot_base, load_articles as load_snapshot
+from metrics import timed
+
+# sentence_transformers (and torch) and sklearn are imported on first use,
+# so processes that only serve plain searches never load them
+
+DEFAULT_MODEL_NAME = 'roberta-base-nli-stsb-mean-tokens'
+
+# Maximum number of embeddings kept in memory (768 float32 values, ~3 KB each)
+EMBEDDING_CACHE_SIZE = 20000
+
+# Number of previous snapshots whose sidecar rows precompute_embeddings reuses
+REUSED_SIDECARS = 3
+
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(model_name=DEFAULT_MODEL_NAME):
+    """
+    Return the process-wide SentenceTransformer for model_name.
+    The model is loaded on first use and shared by every caller after that.
+    """
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                with timed('model_load'):
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(model_name)
+                _models[model_name] = model
+    return model
+
+def is_model_loaded(model_name=DEFAULT_MODEL_NAME):
+    """
+    Tell whether get_model has already loaded model_name in this process
+    """
+    return model_name in _models
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of embeddings keyed by a hash of the embedded text.
+    """
+    def __init__(self, max_entries=EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name, text):
+        """
+        Cache key for a text embedded with a given model
+        """
+        return hashlib.sha1(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+embedding_cache = EmbeddingCache()
+
+def embed_texts(texts, model_name=DEFAULT_MODEL_NAME, batch_size=32):
+    """
+    Embed texts, encoding only the ones that are not already cached.
+
+    Args:
+        texts (list): Texts to embed
+        model_name (str): Sentence transformer model to use
+        batch_size (int): Number of texts encoded per batch
+
+    Returns:
+        np.array: One embedding row per text
+    """
+    keys = [EmbeddingCache.key(model_name, text) for text in texts]
+    vectors = [embedding_cache.get(key) for key in keys]
+
+    # Encode each distinct missing text once
+    missing = {}
+    for idx, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(keys[idx], texts[idx])
+
+    if missing:
+        model = get_model(model_name)
+        with timed('encode'):
+            encoded = model.encode(list(missing.values()), batch_size=batch_size)
+        fresh = dict(zip(missing.keys(), encoded))
+        for key, vector in fresh.items():
+            embedding_cache.put(key, vector)
+        vectors = [fresh[keys[idx]] if vector is None else vector for idx, vector in enumerate(vectors)]
+
+    return np.array(vectors)
+
+def normalize_rows(vectors):
+    """
+    Scale each row of a matrix to unit length, leaving all-zero rows as they are.
+
+    Returns:
+        np.array: float32 copy of vectors
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
 
 def load_articles(json_path):
     """
@@ -14,11 +133,148 @@ def load_articles(json_path):
         ...
     ]
     """
-    with open(json_path, 'r', encoding='utf-8') as file:
-        return json.load(file)
+    return load_snapshot(json_path)
+
+
+def article_text(article):
+    """
+    Text embedded for an article by searches and precomputed sidecars
+    """
+    return f"{article.get('title', '')} {article.get('summary', '')}"
+
+def embedding_paths(snapshot_path):
+    """
+    Return the (vectors, row mapping) sidecar paths for a snapshot file
+    """
+    base = snapshot_base(snapshot_path)
+    return base + '.emb.npy', base + '.emb.json'
+
+def precompute_embeddings(snapshot_path, articles, model_name=DEFAULT_MODEL_NAME, dtype='float32', batch_size=64):
+    """
+    Embed every article of a snapshot and store the vectors next to it.
+
+    Writes <snapshot>.emb.npy with one row per article and <snapshot>.emb.json
+    mapping each row to the article link. Rows of articles already embedded
+    in the newest REUSED_SIDECARS previous snapshots are copied by link, so
+    only new articles are encoded.
+
+    Args:
+        snapshot_path (str): Path of the snapshot file
+        articles (list): Articles stored in the snapshot
+        model_name (str): Sentence transformer model to use
+        dtype (str): 'float32' or 'float16'
+        batch_size (int): Number of texts encoded per batch
+
+    Returns:
+        str: Path of the written .npy file
+    """
+    vectors_path, mapping_path = embedding_paths(snapshot_path)
+    previous = [
+        path for path, _ in list_snapshots(os.path.dirname(snapshot_path) or '.')
+        if os.path.abspath(path) != os.path.abspath(snapshot_path)
+    ][:REUSED_SIDECARS]
+    embeddings = embeddings_for_articles(articles, previous, model_name, batch_size)
+    embeddings = np.asarray(embeddings, dtype=dtype).reshape(len(articles), -1)
 
+    # Write to temporary files first so readers never map a partial file
+    with open(vectors_path + '.tmp', 'wb') as f:
+        np.save(f, embeddings)
+    with open(mapping_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({
+            "model": model_name,
+            "links": [article.get('link', '') for article in articles]
+        }, f, ensure_ascii=False)
+    os.replace(vectors_path + '.tmp', vectors_path)
+    os.replace(mapping_path + '.tmp', mapping_path)
 
-def embed_articles(articles, model_name='roberta-base-nli-stsb-mean-tokens'):
+    print(f"Saved {len(articles)} embeddings to {vectors_path}")
+    return vectors_path
+
+# Memory-mapped sidecars, least recently used first. Every retained snapshot
+# fits, so the semantic index can keep reusing them.
+MAX_CACHED_SIDECARS = MAX_RETAINED_SNAPSHOTS
+
+_sidecars = OrderedDict()
+_sidecars_lock = threading.Lock()
+
+def load_embeddings(snapshot_path, model_name=DEFAULT_MODEL_NAME):
+    """
+    Memory-map the precomputed embeddings of a snapshot.
+
+    Returns:
+        tuple: (vectors, rows) where vectors is a read-only memory-mapped
+               array and rows maps article links to row numbers, or None if
+               the snapshot has no sidecar for model_name
+    """
+    vectors_path, mapping_path = embedding_paths(snapshot_path)
+    try:
+        mtime = os.path.getmtime(vectors_path)
+    except OSError:
+        return None
+
+    with _sidecars_lock:
+        cached = _sidecars.get(vectors_path)
+        if cached is not None and cached[0] == mtime:
+            _sidecars.move_to_end(vectors_path)
+            return cached[1]
+
+    with open(mapping_path, 'r', encoding='utf-8') as f:
+        mapping = json.load(f)
+    if mapping.get("model") != model_name:
+        return None
+
+    vectors = np.load(vectors_path, mmap_mode='r')
+    rows = {}
+    for row, link in enumerate(mapping["links"]):
+        rows.setdefault(link, row)
+
+    with _sidecars_lock:
+        _sidecars[vectors_path] = (mtime, (vectors, rows))
+        _sidecars.move_to_end(vectors_path)
+        # Release the mappings of sidecars deleted with their snapshots
+        for path in [path for path in _sidecars if not os.path.exists(path)]:
+            del _sidecars[path]
+        while len(_sidecars) > MAX_CACHED_SIDECARS:
+            _sidecars.popitem(last=False)
+    return vectors, rows
+
+def embeddings_for_articles(articles, snapshot_paths=(), model_name=DEFAULT_MODEL_NAME, batch_size=32):
+    """
+    Get embeddings for articles, preferring precomputed sidecar rows.
+
+    Articles that are not found in any sidecar are embedded with embed_texts.
+
+    Args:
+        articles (list): Articles to embed
+        snapshot_paths (list): Snapshots whose sidecars may hold the articles
+        model_name (str): Sentence transformer model to use
+        batch_size (int): Number of texts encoded per batch
+
+    Returns:
+        np.array: float32 embeddings, one row per article
+    """
+    sidecars = [sidecar for sidecar in (load_embeddings(path, model_name) for path in snapshot_paths) if sidecar]
+
+    vectors = [None] * len(articles)
+    for idx, article in enumerate(articles):
+        # Articles without a link cannot be told apart in a sidecar
+        if not article.get('link'):
+            continue
+        for sidecar_vectors, rows in sidecars:
+            row = rows.get(article.get('link'))
+            if row is not None:
+                vectors[idx] = np.asarray(sidecar_vectors[row], dtype=np.float32)
+                break
+
+    missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+    if missing:
+        encoded = embed_texts([article_text(articles[idx]) for idx in missing], model_name, batch_size)
+        for idx, vector in zip(missing, encoded):
+            vectors[idx] = np.asarray(vector, dtype=np.float32)
+
+    return np.array(vectors, dtype=np.float32)
+
+def embed_articles(articles, model_name=DEFAULT_MODEL_NAME):
     """
     Generate embeddings for articles using a sentence transformer.
 
@@ -29,20 +285,84 @@ def embed_articles(articles, model_name='roberta-base-nli-stsb-mean-tokens'):
     Returns:
         tuple: (embeddings, processed_articles)
     """
-    # Initialize model
-    model = SentenceTransformer(model_name)
-
     # Extract text to embed (combine title and content)
     texts = [f"{article.get('title', '')}" for article in articles]
 
-    # Generate embeddings with an appropriate prompt
-    prompt = "Generate embeddings that emphasize article similarity."
-    embeddings = model.encode(texts)
+    # Generate embeddings with the shared model, reusing cached ones
+    embeddings = embed_texts(texts, model_name)
 
     return embeddings, articles
 
 
-def cluster_articles(embeddings, eps=0.3, min_samples=2):
+def radius_neighbor_graph(embeddings, eps, block_size=1024):
+    """
+    Build the sparse graph of article pairs within cosine distance eps.
+
+    Vectors are normalized once, so cosine distance is 1 - dot product and
+    equals half the squared euclidean distance. Vectors are then sorted by
+    their projection on the first principal direction: two vectors can only
+    be within euclidean radius sqrt(2 * eps) if their projections are, so
+    each block of rows is compared with a sliding window of later rows
+    instead of with every row. Each pair is computed once and mirrored. The
+    result is the same as an all-pairs search, and memory grows with the
+    number of neighbors rather than with N squared.
+
+    Args:
+        embeddings (np.array): Article embeddings
+        eps (float): Maximum cosine distance between neighbors
+        block_size (int): Number of rows compared per matrix product
+
+    Returns:
+        scipy.sparse.csr_matrix: Cosine distances of neighboring pairs
+    """
+    from scipy.sparse import csr_matrix
+
+    vectors = normalize_rows(embeddings)
+    n = len(vectors)
+
+    # Sort by the first principal direction, estimated by power iteration on a sample
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(n, size=min(n, 2000), replace=False)]
+    sample = sample - sample.mean(axis=0)
+    direction = rng.standard_normal(vectors.shape[1]).astype(np.float32)
+    for _ in range(10):
+        direction = sample.T @ (sample @ direction)
+        direction /= np.linalg.norm(direction) or 1.0
+    projection = vectors @ direction
+    order = np.argsort(projection, kind='stable')
+    vectors = vectors[order]
+    projection = projection[order]
+
+    # Small slack keeps float rounding from pruning a true neighbor
+    window = np.sqrt(2.0 * eps) + 1e-4
+
+    rows, cols, values = [], [], []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        end = max(stop, int(np.searchsorted(projection, projection[stop - 1] + window, side='right')))
+        block_distances = 1.0 - vectors[start:stop] @ vectors[start:end].T
+        np.clip(block_distances, 0.0, 2.0, out=block_distances)
+
+        # Keep each pair once: columns at or after the row's own position
+        block_rows, block_cols = np.nonzero(block_distances <= eps)
+        keep = block_cols >= block_rows
+        block_rows, block_cols = block_rows[keep], block_cols[keep]
+        rows.append(block_rows + start)
+        cols.append(block_cols + start)
+        values.append(block_distances[block_rows, block_cols])
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    values = np.concatenate(values)
+
+    # Mirror the pairs and map positions back to the original order
+    off_diagonal = rows != cols
+    all_rows = np.concatenate([order[rows], order[cols[off_diagonal]]])
+    all_cols = np.concatenate([order[cols], order[rows[off_diagonal]]])
+    all_values = np.concatenate([values, values[off_diagonal]])
+    return csr_matrix((all_values, (all_rows, all_cols)), shape=(n, n))
+
+def cluster_articles(embeddings, eps=0.3, min_samples=2, method='radius'):
     """
     Cluster articles using DBSCAN algorithm.
     
@@ -50,19 +370,55 @@ def cluster_articles(embeddings, eps=0.3, min_samples=2):
         embeddings (np.array): Article embeddings
         eps (float): Maximum distance between two samples to be considered in the same neighborhood
         min_samples (int): Minimum number of samples in a neighborhood for a point to be considered a core point
+        method (str): 'radius' runs DBSCAN on a precomputed blocked radius graph over
+                      unit vectors, 'brute' runs DBSCAN with metric='cosine' directly.
+                      Both give the same labels.
     
     Returns:
         list: Cluster assignments for each article
     """
+    if len(embeddings) == 0:
+        return np.zeros(0, dtype=int)
+    
+    from sklearn.cluster import DBSCAN
+    
     # Perform clustering
-    clustering = DBSCAN(
-        eps=eps, 
-        min_samples=min_samples, 
-        metric='cosine'
-    ).fit(embeddings)
+    if method == 'radius':
+        with timed('neighbor_graph'):
+            graph = radius_neighbor_graph(embeddings, eps)
+        with timed('dbscan'):
+            clustering = DBSCAN(
+                eps=eps,
+                min_samples=min_samples,
+                metric='precomputed'
+            ).fit(graph)
+    else:
+        with timed('dbscan'):
+            clustering = DBSCAN(
+                eps=eps, 
+                min_samples=min_samples, 
+                metric='cosine'
+            ).fit(embeddings)
     
     return clustering.labels_
 
+def cluster_search_results(articles, snapshot_paths=(), model_name=DEFAULT_MODEL_NAME):
+    """
+    Embed and cluster search results.
+    This is the entry point of background clustering jobs (see jobs.py), so
+    it takes and returns only plain, picklable values.
+    
+    Args:
+        articles (list): Articles with at least title, summary and link
+        snapshot_paths (list): Snapshots whose sidecars may hold the articles
+        model_name (str): Sentence transformer model to use
+    
+    Returns:
+        list: Cluster label of each article
+    """
+    embeddings = embeddings_for_articles(articles, snapshot_paths, model_name)
+    return [int(label) for label in cluster_articles(embeddings)]
+
 def analyze_clusters(articles, embeddings, labels):
     """
     Analyze and print out the clusters.
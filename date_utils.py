@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_tz
+
+# Format every publish date is normalized to at scrape time
+CANONICAL_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def parse_rfc822(date_str):
+    """
+    Parse an RSS-style (RFC 822) date string into a naive UTC datetime.
+
+    Some feeds emit an hour of 24 (e.g. 'Mon, 27 Jan 2025 24:25:04 +0530'),
+    which is rolled over into the next day instead of being rejected.
+
+    Args:
+        date_str (str): Date string to parse
+
+    Returns:
+        datetime: Parsed datetime or None if parsing fails
+    """
+    parts = parsedate_tz(date_str) if isinstance(date_str, str) else None
+    if parts is None:
+        return None
+    year, month, day, hour, minute, second = parts[:6]
+    try:
+        parsed = datetime(year, month, day, 0, minute, second) + timedelta(hours=hour)
+    except (ValueError, TypeError):
+        return None
+    offset = parts[9] or 0
+    return parsed - timedelta(seconds=offset)
+
+def normalize_date(value):
+    """
+    Normalize a publish date to a naive UTC datetime.
+
+    Args:
+        value (str, time.struct_time or tuple): Date as found in a feed entry
+
+    Returns:
+        datetime: Normalized datetime or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+    if isinstance(value, tuple):
+        # time.struct_time from feedparser, already in UTC
+        try:
+            return datetime(*value[:6])
+        except (ValueError, TypeError):
+            return None
+    if not isinstance(value, str):
+        return None
+
+    value = value.strip()
+    try:
+        return datetime.strptime(value, CANONICAL_DATE_FORMAT)
+    except ValueError:
+        pass
+
+    parsed = parse_rfc822(value)
+    if parsed is not None:
+        return parsed
+
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def format_date(value):
+    """
+    Format a datetime in the canonical publish date format
+    """
+    return value.strftime(CANONICAL_DATE_FORMAT)
+
+def parse_date(date_str):
+    """
+    Parse date string into datetime object.
+
+    Args:
+        date_str (str): Date string to parse
+
+    Returns:
+        datetime: Parsed datetime object or None if parsing fails
+    """
+    date_formats = [
+        '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y',
+        '%B %d, %Y', '%d %B %Y', '%Y %B %d',
+        '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S'
+    ]
+
+    for fmt in date_formats:
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except (ValueError, TypeError):
+            continue
+
+    # RSS-style and ISO 8601 strings stored by older scrapes
+    parsed = normalize_date(date_str)
+    return parsed.date() if parsed else None
@@ -0,0 +1,264 @@
+"""
+Near-duplicate article detection with MinHash and locality-sensitive hashing.
+
+Several feeds carry the same stories (the news18 india feeds, the indiatoday
+pair, globalnews and globalnews/world). Before a scrape is saved, every
+article is compared with the articles seen in previous scrapes and earlier
+in the same scrape. Syndicated copies are collapsed into one canonical
+article that lists the other copies in 'alternate_links' and
+'alternate_sources'.
+
+Each article gets a MinHash signature over word shingles of its title,
+summary and full content. The signature is split into LSH bands, and only
+articles sharing a band are compared, so the cost per new article does not
+grow with the size of the retained corpus. Candidates are confirmed by the
+estimated shingle similarity and by the similarity of their titles, which
+keeps articles that share site boilerplate apart.
+
+The detector state (signatures of canonical articles and the link aliases of
+their copies) is saved next to the snapshots and pruned by age and size.
+"""
+import os
+import time
+import zlib
+import numpy as np
+from search_index import tokenize
+from state_file import read_state, write_atomically
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16                  # 16 bands of 8 rows: pairs above ~0.7 similarity collide
+SHINGLE_SIZE = 4
+SIMILARITY_THRESHOLD = 0.7      # Minimum estimated shingle similarity
+TITLE_THRESHOLD = 0.5           # Minimum Jaccard similarity of title words
+MIN_CONTENT_LENGTH = 200        # Shorter full content is usually an error message or a stub
+
+RETENTION_SECONDS = 14 * 24 * 3600
+MAX_TRACKED_ARTICLES = 100000
+DEFAULT_STATE_PATH = os.path.join('scrapes', 'dedup_state.npz')
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)[:, None]
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)[:, None]
+
+def article_shingles(article):
+    """
+    Return the set of word shingles of an article's title, summary and content.
+
+    Contents that look like extraction errors are left out so that unrelated
+    articles do not look alike because of the same error message.
+    """
+    content = str(article.get('full_content') or '')
+    if len(content) < MIN_CONTENT_LENGTH or content.startswith('Error extracting content'):
+        content = ''
+    tokens = tokenize(' '.join([str(article.get('title', '')), str(article.get('summary', '')), content]))
+    if len(tokens) <= SHINGLE_SIZE:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(shingles):
+    """
+    Compute the MinHash signature of a set of shingles.
+
+    Returns:
+        numpy.ndarray: NUM_PERMUTATIONS uint32 values
+    """
+    if not shingles:
+        return np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint32)
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = np.bitwise_and((_PERM_A * hashes + _PERM_B) % _MERSENNE_PRIME, _MAX_HASH)
+    return permuted.min(axis=1).astype(np.uint32)
+
+def _jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class DuplicateDetector:
+    """
+    MinHash-LSH index of canonical articles, keyed by link.
+
+    Attributes:
+        path (str): File the state is loaded from and saved to, or None
+    """
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._rows = int(NUM_PERMUTATIONS / LSH_BANDS)
+        self._signatures = {}      # canonical link -> signature
+        self._titles = {}          # canonical link -> title
+        self._last_seen = {}       # canonical link -> unix time
+        self._aliases = {}         # duplicate link -> canonical link
+        self._buckets = [{} for _ in range(LSH_BANDS)]
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _bands(self, signature):
+        rows = self._rows
+        return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(LSH_BANDS)]
+
+    def _index(self, link, signature):
+        for buckets, key in zip(self._buckets, self._bands(signature)):
+            buckets.setdefault(key, set()).add(link)
+
+    def _unindex(self, link, signature):
+        for buckets, key in zip(self._buckets, self._bands(signature)):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(link)
+                if not bucket:
+                    del buckets[key]
+
+    def add(self, link, title, signature, seen=None):
+        """
+        Register a canonical article
+        """
+        if link in self._signatures:
+            self._unindex(link, self._signatures[link])
+        self._signatures[link] = signature
+        self._titles[link] = title
+        self._last_seen[link] = seen if seen is not None else time.time()
+        self._index(link, signature)
+
+    def find(self, signature, title):
+        """
+        Find a known canonical article that is a near duplicate.
+
+        Args:
+            signature (numpy.ndarray): MinHash signature of the new article
+            title (str): Title of the new article
+
+        Returns:
+            str: Link of the most similar canonical article, or None
+        """
+        candidates = set()
+        for buckets, key in zip(self._buckets, self._bands(signature)):
+            candidates.update(buckets.get(key, ()))
+
+        words = set(tokenize(title))
+        best_link, best_similarity = None, SIMILARITY_THRESHOLD
+        for link in candidates:
+            similarity = float(np.mean(self._signatures[link] == signature))
+            if similarity >= best_similarity and _jaccard(words, set(tokenize(self._titles[link]))) >= TITLE_THRESHOLD:
+                best_link, best_similarity = link, similarity
+        return best_link
+
+    def canonical_link(self, article, signature):
+        """
+        Return the canonical link for an article, registering it as a new
+        canonical article when it has no near duplicate. Returns None for
+        articles without a link.
+        """
+        link = article.get('link', '')
+        if not link:
+            return None
+        now = time.time()
+        canonical = self._aliases.get(link, link if link in self._signatures else None)
+        if canonical is None:
+            canonical = self.find(signature, str(article.get('title', '')))
+            if canonical is None:
+                self.add(link, str(article.get('title', '')), signature, now)
+                return link
+            self._aliases[link] = canonical
+        self._last_seen[canonical] = now
+        return canonical
+
+    def prune(self, now=None):
+        """
+        Forget canonical articles not seen within RETENTION_SECONDS, then the
+        least recently seen ones beyond MAX_TRACKED_ARTICLES
+        """
+        now = now if now is not None else time.time()
+        by_age = sorted(self._last_seen, key=self._last_seen.get, reverse=True)
+        keep = {link for link in by_age[:MAX_TRACKED_ARTICLES] if now - self._last_seen[link] <= RETENTION_SECONDS}
+        for link in by_age:
+            if link not in keep:
+                self._unindex(link, self._signatures.pop(link))
+                del self._titles[link]
+                del self._last_seen[link]
+        self._aliases = {alias: link for alias, link in self._aliases.items() if link in keep}
+
+    def save(self):
+        """
+        Save the signatures, titles and aliases as a compressed .npz file
+        """
+        links = list(self._signatures)
+        aliases = list(self._aliases.items())
+        write_atomically(
+            self.path,
+            lambda f: np.savez_compressed(
+                f,
+                links=np.array(links, dtype=str),
+                titles=np.array([self._titles[link] for link in links], dtype=str),
+                last_seen=np.array([self._last_seen[link] for link in links], dtype=np.float64),
+                signatures=np.array([self._signatures[link] for link in links], dtype=np.uint32).reshape(len(links), NUM_PERMUTATIONS),
+                alias_links=np.array([alias for alias, _ in aliases], dtype=str),
+                alias_targets=np.array([target for _, target in aliases], dtype=str)
+            )
+        )
+
+    def load(self):
+        """
+        Load the canonical articles and aliases saved by save
+        """
+        def read(f):
+            with np.load(f) as state:
+                for link, title, seen, signature in zip(state['links'], state['titles'], state['last_seen'], state['signatures']):
+                    self.add(str(link), str(title), signature, float(seen))
+                self._aliases = dict(zip(map(str, state['alias_links']), map(str, state['alias_targets'])))
+        read_state(self.path, read, 'duplicate detector state')
+
+def collapse_duplicates(articles, detector):
+    """
+    Collapse near-duplicate articles into canonical ones.
+
+    Every group of copies is replaced by one article, in the position of its
+    first copy. That is the copy with the canonical link when it is present,
+    otherwise the first copy. It gets 'alternate_links' and
+    'alternate_sources' listing the other copies.
+
+    Args:
+        articles (list): Articles of one scrape
+        detector (DuplicateDetector): Index of previously seen articles, updated in place
+
+    Returns:
+        list: The collapsed articles
+    """
+    groups = {}
+    for article in articles:
+        canonical = detector.canonical_link(article, minhash_signature(article_shingles(article)))
+        # Articles without a link cannot be referenced and are kept as they are
+        groups.setdefault(canonical if canonical is not None else id(article), []).append(article)
+
+    collapsed = []
+    for canonical, copies in groups.items():
+        primary = next((copy for copy in copies if copy.get('link', '') == canonical), copies[0])
+        if len(copies) > 1:
+            primary = dict(primary)
+            links = [primary.get('link', '')]
+            sources = [primary.get('source', '')]
+            for copy in copies:
+                if copy.get('link', '') not in links:
+                    links.append(copy.get('link', ''))
+                if copy.get('source', '') not in sources:
+                    sources.append(copy.get('source', ''))
+            if len(links) > 1:
+                primary['alternate_links'] = links[1:]
+            if len(sources) > 1:
+                primary['alternate_sources'] = sources[1:]
+        collapsed.append(primary)
+    return collapsed
+
+_detector = None
+
+def get_detector(path=DEFAULT_STATE_PATH):
+    """
+    Return the process-wide DuplicateDetector, loading its state on first use
+    """
+    global _detector
+    if _detector is None:
+        _detector = DuplicateDetector(path)
+    return _detector
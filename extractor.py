@@ -0,0 +1,286 @@
+"""
+Article text extraction and the raw page archive.
+
+extract_text parses a page with lxml (libxml2) and looks up the candidate
+containers with compiled XPath expressions, in the same order as the original
+BeautifulSoup strategies (kept as extract_text_bs4 for comparison):
+
+1. the first <article>
+2. the first <div> whose class contains 'content'
+3. the first <div> whose class contains 'body'
+4. the first <div> whose id contains 'content'
+5. <body>
+
+Only the chosen container is walked for text, and <script>, <style> and
+<template> contents are skipped just as BeautifulSoup's get_text skips them.
+
+Every page downloaded by the scraper is also kept, gzip-compressed, in the
+raw page archive (scrapes/raw), so changes to the extraction logic can be
+re-run over earlier scrapes without downloading anything:
+
+    python extractor.py --reextract
+    python extractor.py --reextract --workers 8 --update-state
+"""
+import argparse
+import codecs
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree, html as lxml_html
+
+MAX_CONTENT_LENGTH = 5000
+RETENTION_SECONDS = 7 * 24 * 3600
+DEFAULT_ARCHIVE_DIR = os.path.join('scrapes', 'raw')
+ARCHIVE_SUFFIX = '.html.gz'
+
+_SKIPPED_TAGS = ('script', 'style', 'template')
+_LOWER = "translate({}, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+_CONTENT_STRATEGIES = [
+    etree.XPath("(//article)[1]"),
+    etree.XPath(f"(//div[contains({_LOWER.format('@class')}, 'content')])[1]"),
+    etree.XPath(f"(//div[contains({_LOWER.format('@class')}, 'body')])[1]"),
+    etree.XPath(f"(//div[contains({_LOWER.format('@id')}, 'content')])[1]"),
+    etree.XPath("(//body)[1]")
+]
+
+_CHARSET_HEADER = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_CHARSET_META = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+def detect_encoding(data, content_type=None):
+    """
+    Pick the encoding of an HTML page: the HTTP charset, then a byte order
+    mark, then a <meta> charset near the top of the page, then UTF-8.
+
+    Args:
+        data (bytes): Raw page
+        content_type (str, optional): Content-Type response header
+
+    Returns:
+        str: Codec name known to Python
+    """
+    candidates = []
+    if content_type:
+        match = _CHARSET_HEADER.search(content_type)
+        if match:
+            candidates.append(match.group(1))
+    if data.startswith(codecs.BOM_UTF8):
+        candidates.append('utf-8-sig')
+    elif data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        candidates.append('utf-16')
+    match = _CHARSET_META.search(data[:4096])
+    if match:
+        candidates.append(match.group(1).decode('ascii', 'ignore'))
+
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+def decode_html(data, content_type=None):
+    """
+    Decode a raw page to text, falling back to windows-1252 for pages that
+    are not valid in their declared encoding
+    """
+    encoding = detect_encoding(data, content_type)
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError:
+        return data.decode('windows-1252', errors='replace')
+
+def _truncate(text):
+    # Limit text length to prevent extremely large outputs
+    return text[:MAX_CONTENT_LENGTH] + '...' if len(text) > MAX_CONTENT_LENGTH else text
+
+def extract_text(data, content_type=None):
+    """
+    Extract the article text of a page with lxml.
+
+    Args:
+        data (bytes or str): Raw page, or already decoded text
+        content_type (str, optional): Content-Type response header, used to decode bytes
+
+    Returns:
+        str: Extracted text (at most MAX_CONTENT_LENGTH characters plus '...'),
+             or "No content could be extracted"
+    """
+    text = decode_html(data, content_type) if isinstance(data, bytes) else data
+    # lxml refuses decoded strings that still declare an encoding
+    text = _XML_DECLARATION.sub('', text, count=1)
+    if not text.strip():
+        return "No content could be extracted"
+    document = lxml_html.document_fromstring(text, parser=lxml_html.HTMLParser(remove_comments=True, remove_pis=True))
+
+    for strategy in _CONTENT_STRATEGIES:
+        found = strategy(document)
+        if found:
+            container = found[0]
+            etree.strip_elements(container, *_SKIPPED_TAGS, with_tail=False)
+            parts = (part.strip() for part in container.itertext())
+            return _truncate(' '.join(part for part in parts if part))
+    return "No content could be extracted"
+
+def extract_text_bs4(data):
+    """
+    The original BeautifulSoup extraction with the pure-Python html.parser,
+    kept as the reference for benchmarks and comparisons with extract_text
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(data, 'html.parser')
+
+    # Try multiple strategies to extract content
+    content_strategies = [
+        lambda: soup.find('article'),  # Look for <article> tag
+        lambda: soup.find('div', class_=lambda x: x and 'content' in x.lower()),
+        lambda: soup.find('div', class_=lambda x: x and 'body' in x.lower()),
+        lambda: soup.find('div', id=lambda x: x and 'content' in x.lower()),
+        lambda: soup.find('body')  # Fallback to entire body
+    ]
+
+    for strategy in content_strategies:
+        content = strategy()
+        if content:
+            return _truncate(content.get_text(strip=True, separator=' '))
+
+    return "No content could be extracted"
+
+class RawPageArchive:
+    """
+    Gzip-compressed raw pages, one file per URL.
+
+    Each file starts with a JSON header line (url, content type, fetch time)
+    followed by the page exactly as it was downloaded.
+
+    Attributes:
+        directory (str): Directory holding the archived pages
+    """
+    def __init__(self, directory=DEFAULT_ARCHIVE_DIR):
+        self.directory = directory
+
+    def path_for(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ARCHIVE_SUFFIX)
+
+    def store(self, url, data, content_type=None):
+        """
+        Archive a downloaded page, replacing any earlier copy atomically
+        """
+        path = self.path_for(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = json.dumps({"url": url, "content_type": content_type, "fetched": time.time()})
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(header.encode('utf-8') + b'\n')
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def paths(self):
+        """
+        Return the paths of all archived pages
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            entry.path
+            for shard in os.scandir(self.directory) if shard.is_dir()
+            for entry in os.scandir(shard.path) if entry.name.endswith(ARCHIVE_SUFFIX)
+        ]
+
+    def prune(self, now=None):
+        """
+        Delete pages archived more than RETENTION_SECONDS ago
+
+        Returns:
+            int: Number of deleted pages
+        """
+        now = now if now is not None else time.time()
+        removed = 0
+        for path in self.paths():
+            try:
+                if now - os.path.getmtime(path) > RETENTION_SECONDS:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+def read_archived_page(path):
+    """
+    Read an archived page.
+
+    Returns:
+        tuple: (header dict, raw page bytes)
+    """
+    with gzip.open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        return header, f.read()
+
+def _reextract_page(path):
+    """
+    Extract one archived page, run in a worker process by reextract_archive
+    """
+    try:
+        header, data = read_archived_page(path)
+        return header['url'], extract_text(data, header.get('content_type'))
+    except Exception as e:
+        return None, f"Error extracting content: {str(e)}"
+
+def reextract_archive(archive=None, workers=None):
+    """
+    Run extract_text over every archived page on a process pool.
+
+    Args:
+        archive (RawPageArchive, optional): Archive to read, the default one if omitted
+        workers (int, optional): Number of worker processes, one per CPU if omitted
+
+    Returns:
+        dict: Extracted text by URL
+    """
+    archive = archive or RawPageArchive()
+    paths = archive.paths()
+    if not paths:
+        return {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_reextract_page, paths, chunksize=max(1, len(paths) // 64))
+        return {url: content for url, content in results if url is not None}
+
+_archive = None
+
+def get_archive():
+    """
+    Return the process-wide RawPageArchive
+    """
+    global _archive
+    if _archive is None:
+        _archive = RawPageArchive()
+    return _archive
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract article text from the raw page archive")
+    parser.add_argument('--reextract', action='store_true', help="Extract every archived page again")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--update-state', action='store_true',
+                        help="Store the new text in the fetch state so the next scrape uses it")
+    args = parser.parse_args()
+    if not args.reextract:
+        parser.print_help()
+        raise SystemExit(0)
+
+    start = time.perf_counter()
+    contents = reextract_archive(workers=args.workers)
+    seconds = time.perf_counter() - start
+    print(f"Re-extracted {len(contents)} pages in {seconds:.2f}s ({len(contents) / max(seconds, 1e-9):.0f} pages/s)")
+
+    if args.update_state:
+        from fetch_state import FetchState
+        state = FetchState()
+        updated = sum(1 for url, content in contents.items() if state.update_content(url, content))
+        state.save()
+        print(f"Updated the content of {updated} articles in {state.path}")
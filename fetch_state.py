@@ -0,0 +1,155 @@
+"""
+Persistent state carried between scrape runs.
+
+For every feed the ETag and Last-Modified values of the last response are
+kept, so the next run sends a conditional request and an unchanged feed costs
+a 304 instead of a full download. The links the feed listed are kept as well,
+so its articles can be rebuilt from the cache after a 304.
+
+For every known article link the article itself is kept, with its extracted
+full content, so entries seen in an earlier run need no HTTP request at all.
+Failed extractions are not cached and are retried on the next run.
+
+Articles and feeds not seen for RETENTION_SECONDS are dropped, and at most
+MAX_CACHED_ARTICLES articles are kept.
+"""
+import gzip
+import json
+import os
+import time
+from state_file import read_state, write_atomically
+
+RETENTION_SECONDS = 7 * 24 * 3600
+MAX_CACHED_ARTICLES = 20000
+DEFAULT_STATE_PATH = os.path.join('scrapes', 'fetch_state.json.gz')
+
+# Content placeholders written by the scraper when extraction fails
+FAILED_CONTENT_PREFIXES = ('Error extracting content', 'Unable to fetch full content')
+
+def is_extracted_content(content):
+    """
+    Tell whether a full_content value is a successful extraction worth caching
+    """
+    return bool(content) and not content.startswith(FAILED_CONTENT_PREFIXES)
+
+class FetchState:
+    """
+    Feed validators and known articles, loaded from and saved to a gzip JSON file.
+
+    Attributes:
+        path (str): File the state is loaded from and saved to
+    """
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._feeds = {}       # feed url -> {"etag", "modified", "links", "seen"}
+        self._articles = {}    # link -> {"article", "seen"}
+        if os.path.exists(path):
+            self.load()
+
+    def feed_validators(self, feed_url):
+        """
+        Return the (etag, modified) values of the last response of a feed
+        """
+        feed = self._feeds.get(feed_url, {})
+        return feed.get('etag'), feed.get('modified')
+
+    def record_feed(self, feed_url, etag, modified, links):
+        """
+        Remember the validators and the article links of a feed response
+        """
+        self._feeds[feed_url] = {
+            "etag": etag,
+            "modified": modified,
+            "links": list(links),
+            "seen": time.time()
+        }
+
+    def feed_articles(self, feed_url):
+        """
+        Rebuild the articles of an unchanged feed from the cache.
+
+        Returns:
+            list: Copies of the cached articles in feed order, or None when the
+                  feed or any of its articles is no longer cached
+        """
+        feed = self._feeds.get(feed_url)
+        if feed is None or any(link not in self._articles for link in feed['links']):
+            return None
+        now = time.time()
+        feed['seen'] = now
+        articles = []
+        for link in feed['links']:
+            entry = self._articles[link]
+            entry['seen'] = now
+            articles.append(dict(entry['article']))
+        return articles
+
+    def cached_content(self, link):
+        """
+        Return the extracted full content of a known article, or None
+        """
+        entry = self._articles.get(link)
+        if entry is None:
+            return None
+        content = entry['article'].get('full_content')
+        return content if is_extracted_content(content) else None
+
+    def record_article(self, article):
+        """
+        Remember an article as it was scraped
+        """
+        self._articles[article.get('link', '')] = {"article": dict(article), "seen": time.time()}
+
+    def update_content(self, link, content):
+        """
+        Replace the full content of a known article, e.g. after re-extracting
+        its archived page. Failed extractions are ignored.
+
+        Returns:
+            bool: True if the article is known and was updated
+        """
+        entry = self._articles.get(link)
+        if entry is None or not is_extracted_content(content):
+            return False
+        entry['article']['full_content'] = content
+        return True
+
+    def prune(self, now=None):
+        """
+        Drop feeds and articles not seen within RETENTION_SECONDS, then the
+        least recently seen articles beyond MAX_CACHED_ARTICLES
+        """
+        now = now if now is not None else time.time()
+        self._feeds = {url: feed for url, feed in self._feeds.items() if now - feed['seen'] <= RETENTION_SECONDS}
+        recent = sorted(
+            (item for item in self._articles.items() if now - item[1]['seen'] <= RETENTION_SECONDS),
+            key=lambda item: item[1]['seen'],
+            reverse=True
+        )
+        self._articles = dict(recent[:MAX_CACHED_ARTICLES])
+
+    def save(self):
+        """
+        Save the feeds and articles as gzip JSON
+        """
+        def write(f):
+            with gzip.open(f, 'wt', encoding='utf-8', compresslevel=6) as text:
+                json.dump({"feeds": self._feeds, "articles": self._articles}, text, ensure_ascii=False)
+        write_atomically(self.path, write)
+
+    def load(self):
+        """
+        Load the feeds and articles saved by save
+        """
+        def read(f):
+            with gzip.open(f, 'rt', encoding='utf-8') as text:
+                state = json.load(text)
+            self._feeds = state.get('feeds', {})
+            self._articles = state.get('articles', {})
+        read_state(self.path, read, 'fetch state')
+
+    def stats(self):
+        """
+        Return the number of cached feeds and articles
+        """
+        return {"feeds": len(self._feeds), "articles": len(self._articles)}
@@ -0,0 +1,189 @@
+"""
+Background jobs on a bounded process pool.
+
+Used by /search?cluster=true&async=true: CPU-heavy clustering runs in a
+separate process, so it neither blocks a request thread nor competes with
+search traffic for the GIL. The pool has at most MAX_JOB_WORKERS processes,
+and submissions beyond MAX_PENDING_JOBS unfinished jobs are refused.
+
+Jobs are keyed by the request that created them; submitting the same key
+again while the job is unfinished (or finished less than JOB_TTL seconds ago)
+returns the existing job instead of starting another one.
+
+If a worker process dies (e.g. killed for using too much memory), the pool
+is unusable. Its unfinished jobs fail, and the next submission replaces it
+with a new pool.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+MAX_JOB_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+MAX_PENDING_JOBS = 32
+MAX_FINISHED_JOBS = 256
+JOB_TTL = 600
+
+class JobQueueFull(Exception):
+    """
+    Raised when too many jobs are already waiting for the pool
+    """
+
+class Job:
+    """
+    A unit of work submitted to the pool.
+
+    Attributes:
+        id (str): Job id used by /jobs/<id>
+        key (tuple): Key of the request that created the job
+        status (str): 'pending', 'done' or 'error'
+        result: Output of the job once it is done
+        error (str): Error message if the job failed
+        created (float): Unix time of submission
+        finished (float): Unix time of completion, or None
+    """
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        job = {"job_id": self.id, "status": self.status}
+        if self.status == 'done':
+            job["result"] = self.result
+        elif self.status == 'error':
+            job["error"] = self.error
+        return job
+
+class JobManager:
+    """
+    Runs functions on a process pool and tracks their results by job id.
+
+    Args:
+        max_workers (int): Number of worker processes
+        max_pending (int): Maximum number of unfinished jobs
+    """
+    def __init__(self, max_workers=MAX_JOB_WORKERS, max_pending=MAX_PENDING_JOBS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Spawned workers start clean instead of inheriting the web process's
+        # threads and loaded snapshots
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _discard_executor(self, executor):
+        # Called with the lock held; a newer pool may already have replaced it
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, args):
+        # Called with the lock held. A broken pool is replaced once.
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            print("Job pool is broken, starting a new one")
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(fn, *args)
+
+    def _prune(self, now):
+        for job_id, job in list(self._jobs.items()):
+            expired = job.finished is not None and now - job.finished > JOB_TTL
+            if expired or (job.finished is not None and len(self._jobs) > MAX_FINISHED_JOBS):
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    def submit(self, key, fn, args=(), on_done=None):
+        """
+        Submit fn(*args) unless an identical job already exists.
+
+        Args:
+            key (tuple): Identifies identical requests
+            fn (callable): Picklable module-level function run in a worker process
+            args (tuple): Picklable arguments for fn
+            on_done (callable, optional): Turns fn's return value into the job result,
+                in the web process
+
+        Returns:
+            Job: The new or existing job. Its status is already 'error' if
+                the pool could not take it.
+
+        Raises:
+            JobQueueFull: If max_pending jobs are already unfinished
+        """
+        with self._lock:
+            now = time.time()
+            self._prune(now)
+            existing = self._by_key.get(key)
+            if existing is not None and self._jobs[existing].status != 'error':
+                return self._jobs[existing]
+
+            pending = sum(1 for job in self._jobs.values() if job.finished is None)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Too many pending jobs ({pending})")
+
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            try:
+                executor, future = self._submit(fn, args)
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.status = 'error'
+                job.finished = time.time()
+                return job
+
+        def finish(future):
+            try:
+                result = future.result()
+                job.result = on_done(result) if on_done is not None else result
+                job.status = 'done'
+            except BrokenProcessPool as e:
+                job.error = str(e) or type(e).__name__
+                job.status = 'error'
+                with self._lock:
+                    self._discard_executor(executor)
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.status = 'error'
+            job.finished = time.time()
+
+        future.add_done_callback(finish)
+        return job
+
+    def get(self, job_id):
+        """
+        Return the job with the given id, or None if it is unknown or expired
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.finished is None)
+            return {"pending": pending, "tracked": len(self._jobs), "max_workers": self.max_workers}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
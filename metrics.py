@@ -0,0 +1,204 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Usage:
+    from metrics import timed, BYTES_DOWNLOADED
+
+    with timed('json_load'):
+        ...
+    BYTES_DOWNLOADED.inc(len(response.content), kind='article')
+
+render() returns every registered metric in the Prometheus text format and
+is served by the /metrics endpoint in app.py. Processes without a web server,
+such as the scraper worker, serve it with serve(port).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    Base class for labelled metrics; one value per combination of label values.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+        lines.append(f'{self.name}_bucket{labels} {count}')
+        lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+        lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+# Metrics shared across modules
+STAGE_SECONDS = Histogram('newsapi_stage_seconds', 'Time spent in each hot-path stage', ['stage'])
+REQUESTS = Counter('newsapi_requests_total', 'HTTP requests handled', ['endpoint', 'status'])
+FEED_FETCH_SECONDS = Histogram('newsapi_feed_fetch_seconds', 'Time to download an RSS feed', ['feed'])
+FEED_PARSE_SECONDS = Histogram('newsapi_feed_parse_seconds', 'Time to turn a feed into article entries', ['feed'])
+ARTICLE_FETCH_SECONDS = Histogram('newsapi_article_fetch_seconds', 'Time to fetch and extract one article page')
+BYTES_DOWNLOADED = Counter('newsapi_bytes_downloaded_total', 'Bytes downloaded by the scraper', ['kind'])
+SCRAPE_RUNS = Counter('newsapi_scrape_runs_total', 'Completed scrape runs')
+ARTICLES_SCRAPED = Counter('newsapi_articles_scraped_total', 'Articles saved by scrape runs')
+LAST_SCRAPE_ARTICLES = Gauge('newsapi_last_scrape_articles', 'Articles saved by the most recent scrape run')
+FETCH_CACHE_HITS = Counter('newsapi_fetch_cache_hits_total', 'Feeds answered with 304 and articles served from the fetch state', ['kind'])
+DUPLICATES_COLLAPSED = Counter('newsapi_duplicates_collapsed_total', 'Scraped articles merged into a canonical copy')
+
+@contextmanager
+def timed(stage=None, histogram=STAGE_SECONDS, **labels):
+    """
+    Time a block of code into a histogram.
+    By default the time is recorded in the stage histogram under the given stage.
+    """
+    if stage is not None:
+        labels['stage'] = stage
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+def timed_iter(stage, iterable):
+    """
+    Yield from iterable and record the total time spent producing its items.
+    Used for streamed responses, where work happens after the view returns.
+    """
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+
+def render(extra_lines=()):
+    """
+    Render all registered metrics in the Prometheus text format
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return '\n'.join(lines) + '\n'
+
+def serve(port, host='0.0.0.0'):
+    """
+    Serve render() at /metrics from a background thread.
+
+    Args:
+        port (int): Port to listen on
+        host (str): Address to bind
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the worker's output
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
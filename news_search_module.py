@@ -1,8 +1,12 @@
-import json
 import os
-import sys
 import re
-from datetime import datetime, date
+from datetime import datetime
+from article_store import get_store, article_id, Snapshot
+from date_utils import parse_date
+from metrics import timed
+from query_engine import parse_query, BM25Scorer, top_k
+from search_index import tokenize
+from snippets import build_snippet, highlight_offsets
 
 def whole_word_search(search_term, text):
     """
@@ -18,148 +22,401 @@ def whole_word_search(search_term, text):
     pattern = r'\b' + re.escape(search_term.lower()) + r'\b'
     return bool(re.search(pattern, text.lower()))
 
-def parse_date(date_str):
+# Fields of a search result entry, in response order
+ARTICLE_FIELDS = ('title', 'link', 'summary', 'full_content', 'author', 'source', 'published_date', 'url_to_image',
+                  'alternate_links', 'alternate_sources', 'score', 'article_id', 'snippet', 'title_highlights')
+
+# How full_content is returned: in full, replaced by a snippet, or left out.
+# Without the full text, entries carry an article_id for /article/<article_id>.
+CONTENT_MODES = ('full', 'snippet', 'none')
+
+def project_fields(article, fields):
     """
-    Parse date string into datetime object.
+    Keep only the requested fields of a search result entry.
     
     Args:
-        date_str (str): Date string to parse
+        article (dict): Search result entry
+        fields (list): Fields to keep, or None to keep all of them
     
     Returns:
-        datetime: Parsed datetime object or None if parsing fails
+        dict: The projected entry
+    """
+    if fields is None:
+        return article
+    return {field: article[field] for field in fields if field in article}
+
+def format_article(article, content_length, article_date, source=None):
     """
-    date_formats = [
-        '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', 
-        '%B %d, %Y', '%d %B %Y', '%Y %B %d',
-        '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S'
-    ]
+    Build a search result entry for an article.
     
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except (ValueError, TypeError):
+    The entry carries internal '_content_length' and '_parsed_date' keys
+    that sort_articles uses and then removes, and with a source an internal
+    '_source' key that apply_content_mode removes.
+    
+    Args:
+        article (dict): Article as stored in the snapshot
+        content_length (int): Length of the article's full content
+        article_date (date): Parsed publish date, or None
+        source (tuple, optional): (snapshot, doc_id) the article was found at
+    
+    Returns:
+        dict: Search result entry
+    """
+    entry = {
+        "title": article.get('title', ''),
+        "link": article.get('link', ''),
+        "summary": article.get('summary', ''),
+        "full_content": article.get('full_content', ''),
+        "author": article.get('author', ''),
+        "source": article.get('source', ''),
+        "published_date": article.get('published_date', ''),
+        "url_to_image": article.get('url_to_image', ''),
+        "alternate_links": article.get('alternate_links', []),
+        "alternate_sources": article.get('alternate_sources', []),
+        "_content_length": content_length,
+        "_parsed_date": article_date
+    }
+    if source is not None:
+        entry["_source"] = source
+    return entry
+
+def sort_articles(matching_articles, sort_by, sort_order):
+    """
+    Sort search result entries in place and remove their internal keys.
+    
+    Args:
+        matching_articles (list): Entries built by format_article
+        sort_by (str): 'date' or 'length'; any other value keeps the current order
+        sort_order (str): 'asc' or 'desc'
+    """
+    if sort_by == 'date':
+        matching_articles.sort(
+            key=lambda x: x['_parsed_date'] or datetime.min.date(), 
+            reverse=(sort_order == 'desc')
+        )
+    elif sort_by == 'length':
+        matching_articles.sort(
+            key=lambda x: x['_content_length'], 
+            reverse=(sort_order == 'desc')
+        )
+    
+    # Remove internal sorting keys
+    for article in matching_articles:
+        article.pop('_content_length', None)
+        article.pop('_parsed_date', None)
+
+def query_terms(query, search_term):
+    """
+    Return the distinct lowercase tokens of a parsed query or a literal search term
+    """
+    return query.terms if query is not None else list(dict.fromkeys(tokenize(search_term)))
+
+def apply_content_mode(page, content_mode, terms, fields=None):
+    """
+    Fill in, replace or drop the full_content of the returned entries and
+    remove their internal '_source' key.
+    
+    Snapshots are loaded without article bodies, so with 'full' each returned
+    entry's full_content is read here, unless fields leaves it out.
+    
+    Args:
+        page (list): Search result entries built with a source
+        content_mode (str): One of CONTENT_MODES. 'snippet' adds a 'snippet' with
+            highlight offsets and the 'title_highlights'; 'snippet' and 'none' drop
+            full_content and add the 'article_id'.
+        terms (list): Lowercase query tokens to highlight
+        fields (list, optional): Fields that will be returned, all of them if omitted
+    
+    Returns:
+        list: The entries, updated in place
+    """
+    read_content = fields is None or 'full_content' in fields
+    for entry in page:
+        snapshot, doc_id = entry.pop('_source')
+        if content_mode == 'full':
+            if read_content:
+                entry["full_content"] = snapshot.content(doc_id)
             continue
-    return None
+        del entry["full_content"]
+        entry["article_id"] = article_id(entry["link"])
+        if content_mode == 'snippet':
+            entry["snippet"] = build_snippet(snapshot, doc_id, terms)
+            entry["title_highlights"] = highlight_offsets(snapshot.index, doc_id, 'title', terms)
+    return page
+
+def rank_matches(matches, snapshots, query, search_term, search_fields, sort_order, k):
+    """
+    Rank matches by BM25 score and build the entries of the best k.
+    
+    Args:
+        matches (list): (snapshot, doc_id, content_length) tuples
+        snapshots (list): Every snapshot that was searched
+        query (Query): Parsed boolean query, or None for a literal search term
+        search_term (str): The literal search term, used when query is None
+        search_fields (tuple): Fields that were searched
+        sort_order (str): 'desc' for the best matches first, 'asc' for the worst first
+        k (int): Number of entries to build, or None for all of them
+    
+    Returns:
+        list: Search result entries with a 'score' key, in rank order
+    """
+    terms = query_terms(query, search_term)
+    scorer = BM25Scorer([snapshot.index for snapshot in snapshots], terms, search_fields)
+    
+    # Group the matches per snapshot so each index is scored in one pass
+    by_snapshot = {}
+    for snapshot, doc_id, content_length in matches:
+        by_snapshot.setdefault(id(snapshot), (snapshot, {}))[1][doc_id] = content_length
+    
+    scored = []
+    for snapshot, lengths in by_snapshot.values():
+        dates = snapshot.date_index.dates
+        for doc_id, score in scorer.score_documents(snapshot.index, lengths).items():
+            # Newer articles win ties
+            tiebreak = dates[doc_id].toordinal() if dates[doc_id] else 0
+            scored.append((score, tiebreak, (snapshot, doc_id, lengths[doc_id])))
+    
+    page = []
+    for score, _, (snapshot, doc_id, content_length) in top_k(scored, k, reverse=(sort_order != 'asc')):
+        entry = format_article(snapshot.articles[doc_id], content_length, None, (snapshot, doc_id))
+        entry.pop('_content_length')
+        entry.pop('_parsed_date')
+        entry["score"] = round(score, 4)
+        page.append(entry)
+    return page
+
+def count_facets(matches, facets, facet_limit=None):
+    """
+    Count facet values among the matches with the snapshots' precomputed facet tables.
+    
+    Args:
+        matches (list): (snapshot, doc_id, content_length) tuples
+        facets (list): Facets to count, a subset of FACET_FIELDS
+        facet_limit (int, optional): Maximum number of values returned per facet
+    
+    Returns:
+        dict: facet -> list of {"value", "count"} entries. 'day' is ordered
+              newest first, the other facets by descending count.
+    """
+    by_snapshot = {}
+    for snapshot, doc_id, _ in matches:
+        by_snapshot.setdefault(id(snapshot), (snapshot, []))[1].append(doc_id)
+    
+    result = {}
+    for facet in facets:
+        counts = {}
+        for snapshot, doc_ids in by_snapshot.values():
+            for value, count in snapshot.facets.counts(facet, doc_ids).items():
+                counts[value] = counts.get(value, 0) + count
+        if facet == 'day':
+            ordered = sorted(counts.items(), reverse=True)
+        else:
+            ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        if facet_limit is not None:
+            ordered = ordered[:facet_limit]
+        result[facet] = [{"value": value, "count": count} for value, count in ordered]
+    return result
 
 def search_news(search_term, json_file_path=None, sort_by='date', sort_order='desc', 
-                min_length=0, max_length=float('inf'), filter_date=None):
+                min_length=0, max_length=float('inf'), filter_date=None, search_content=False,
+                offset=0, limit=None, fields=None, all_snapshots=False, date_from=None, date_to=None,
+                query_mode='literal', facets=None, facet_limit=None, content_mode='full'):
     """
     Search and sort news articles based on various parameters.
     
     Args:
         search_term (str): Term to search for in articles
         json_file_path (str, optional): Path to the JSON file containing scraped articles
-        sort_by (str, optional): Parameter to sort by. Options: 'date', 'length'
+        sort_by (str, optional): Parameter to sort by. Options: 'date', 'length', 'relevance'.
+            'relevance' ranks matches by BM25 score and adds a 'score' key to each article.
         sort_order (str, optional): Sort order. Options: 'asc' (ascending), 'desc' (descending)
         min_length (int, optional): Minimum article length to include
         max_length (int, optional): Maximum article length to include
         filter_date (str or datetime, optional): Specific date to filter articles
+        search_content (bool, optional): Also search the full article content
+        offset (int, optional): Number of sorted results to skip
+        limit (int, optional): Maximum number of results to return
+        fields (list, optional): Article fields to return, defaults to all of them
+        all_snapshots (bool, optional): Search every retained snapshot instead of the newest one.
+            Articles are deduplicated by link, keeping the copy from the newest snapshot,
+            and snapshots whose dates cannot match date_from/date_to are skipped.
+        date_from (str or date, optional): Earliest publish date to include
+        date_to (str or date, optional): Latest publish date to include
+        query_mode (str, optional): 'literal' matches search_term as one whole-word string.
+            'boolean' parses it with AND/OR/NOT, parentheses and quoted phrases (see query_engine.py).
+        facets (list, optional): Facets to count over every match, a subset of FACET_FIELDS.
+            With limit=0 only the counts are computed and no article entries are built.
+        facet_limit (int, optional): Maximum number of values returned per facet
+        content_mode (str, optional): 'full' returns full_content, 'snippet' replaces it with a
+            snippet and highlight offsets, 'none' leaves it out (see apply_content_mode)
     
     Returns:
-        dict: Sorted and filtered search results in JSON-compatible format
+        dict: Sorted and filtered search results in JSON-compatible format.
+              total_articles counts every match, not just the returned page.
     """
     # Normalize search term
     search_term = search_term.strip()
     
+    # Parse boolean queries up front so syntax errors are reported before any work
+    query = None
+    if query_mode == 'boolean':
+        try:
+            query = parse_query(search_term)
+        except ValueError as e:
+            return {
+                "search_term": search_term,
+                "total_articles": 0,
+                "articles": [],
+                "error": f"Invalid query: {str(e)}"
+            }
+    
     # Convert filter_date to date object if it's a string
     if isinstance(filter_date, str):
         filter_date = parse_date(filter_date)
+    if isinstance(date_from, str):
+        date_from = parse_date(date_from)
+    if isinstance(date_to, str):
+        date_to = parse_date(date_to)
     
-    # Find the most recent JSON file
+    # Collect the snapshots to search, newest first
     if not json_file_path:
         try:
-            scrapes_dir = 'scrapes'
-            json_files = [f for f in os.listdir(scrapes_dir) if f.endswith('.json')]
-            json_files.sort(key=lambda x: os.path.getmtime(os.path.join(scrapes_dir, x)), reverse=True)
-            
-            if not json_files:
-                return {
-                    "search_term": search_term,
-                    "total_articles": 0,
-                    "articles": [],
-                    "error": "No scraped articles found"
-                }
-            
-            json_file_path = os.path.join(scrapes_dir, json_files[0])
+            with timed('snapshot_load'):
+                if all_snapshots:
+                    snapshots = get_store().snapshots_in_range(date_from, date_to)
+                else:
+                    snapshot = get_store().current()
+                    snapshots = [snapshot] if snapshot is not None else []
+        except Exception as e:
+            return {
+                "search_term": search_term,
+                "total_articles": 0,
+                "articles": [],
+                "error": f"Error loading latest JSON file: {str(e)}"
+            }
+        
+        if not snapshots and not all_snapshots:
+            return {
+                "search_term": search_term,
+                "total_articles": 0,
+                "articles": [],
+                "error": "No scraped articles found"
+            }
+    else:
+        # Read the snapshot file
+        try:
+            with timed('snapshot_load'):
+                snapshots = [Snapshot.load(json_file_path, os.path.getmtime(json_file_path))]
         except Exception as e:
             return {
                 "search_term": search_term,
                 "total_articles": 0,
                 "articles": [],
-                "error": f"Error finding JSON file: {str(e)}"
+                "error": f"Error reading JSON file: {str(e)}"
             }
     
-    # Read the JSON file
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            articles = json.load(f)
-    except Exception as e:
-        return {
-            "search_term": search_term,
-            "total_articles": 0,
-            "articles": [],
-            "error": f"Error reading JSON file: {str(e)}"
-        }
+    # Fields that are searched, in the order they are joined
+    search_fields = ('title', 'summary', 'full_content') if search_content else ('title', 'summary')
+    
+    # Combine the single-day and range date filters into one inclusive range
+    lower_dates = [d for d in (filter_date, date_from) if d is not None]
+    upper_dates = [d for d in (filter_date, date_to) if d is not None]
+    date_lower = max(lower_dates) if lower_dates else None
+    date_upper = min(upper_dates) if upper_dates else None
+    date_filtered = bool(lower_dates or upper_dates)
     
     # Search and filter articles
     matching_articles = []
+    newer_links = []
+    matched_links = set()
     
-    for article in articles:
-        # Combine searchable fields
-        searchable_text = ' '.join([
-            str(article.get('title', '')),
-            str(article.get('summary', '')),
-            # str(article.get('full_content', '')),
-            # str(article.get('author', ''))
-        ])
-        
-        # Whole word search
-        if whole_word_search(search_term, searchable_text):
-            # Length filtering
-            content_length = len(str(article.get('full_content', '')))
-            if min_length <= content_length <= max_length:
-                # Parse article date
-                article_date = parse_date(article.get('published_date', ''))
+    with timed('match'):
+        for snapshot in snapshots:
+            articles = snapshot.articles
+            
+            # Narrow down to candidate articles with the inverted index
+            if query is not None:
+                doc_ids, exact = query.matches(snapshot.index, search_fields), True
+            else:
+                doc_ids, exact = snapshot.index.lookup(search_term, search_fields)
+            if doc_ids is None:
+                doc_ids = range(len(articles))
+            
+            # Date filtering is a binary search over the snapshot's sorted dates
+            if date_filtered:
+                if date_lower is not None and date_upper is not None and date_lower > date_upper:
+                    in_range = set()
+                else:
+                    in_range = snapshot.date_index.docs_between(date_lower, date_upper)
+                doc_ids = [doc_id for doc_id in doc_ids if doc_id in in_range]
+            
+            for doc_id in doc_ids:
+                article = articles[doc_id]
                 
-                # Date filtering
-                if filter_date is None or (article_date and article_date == filter_date):
-                    matching_articles.append({
-                        "title": article.get('title', ''),
-                        "link": article.get('link', ''),
-                        "summary": article.get('summary', ''),
-                        "full_content": article.get('full_content', ''),
-                        "author": article.get('author', ''),
-                        "source": article.get('source', ''),
-                        "published_date": article.get('published_date', ''),
-                        "url_to_image": article.get('url_to_image', ''),
-                        "_content_length": content_length,
-                        "_parsed_date": article_date
-                    })
-    
-    # Sorting logic
-    if sort_by == 'date':
-        matching_articles.sort(
-            key=lambda x: x['_parsed_date'] or datetime.min.date(), 
-            reverse=(sort_order == 'desc')
-        )
-    elif sort_by == 'length':
-        matching_articles.sort(
-            key=lambda x: x['_content_length'], 
-            reverse=(sort_order == 'desc')
-        )
+                # A newer snapshot holds the current copy of this article
+                if newer_links and any(article.get('link', '') in seen for seen in newer_links):
+                    continue
+                if all_snapshots and article.get('link', '') in matched_links:
+                    continue
+                
+                # Whole word search, unless the index already guarantees a match
+                if exact or whole_word_search(search_term, ' '.join(str(snapshot.index.field_value(doc_id, field)) for field in search_fields)):
+                    # Length filtering
+                    content_length = snapshot.content_lengths[doc_id]
+                    if min_length <= content_length <= max_length:
+                        matching_articles.append((snapshot, doc_id, content_length))
+                        matched_links.add(article.get('link', ''))
+            
+            newer_links.append(snapshot.links)
     
-    # Remove internal sorting keys
-    for article in matching_articles:
-        article.pop('_content_length', None)
-        article.pop('_parsed_date', None)
+    total_articles = len(matching_articles)
+    
+    facet_counts = None
+    if facets:
+        with timed('facets'):
+            facet_counts = count_facets(matching_articles, facets, facet_limit)
+    
+    if limit == 0:
+        # Counts only, nothing to sort or build
+        page = []
+    elif sort_by == 'relevance':
+        # Score every match but only build entries for the requested page
+        with timed('rank'):
+            page = rank_matches(matching_articles, snapshots, query, search_term, search_fields,
+                                sort_order, None if limit is None else offset + limit)[offset:]
+    else:
+        # Sorting logic
+        with timed('sort'):
+            matching_articles = [
+                format_article(snapshot.articles[doc_id], content_length, snapshot.date_index.dates[doc_id],
+                               (snapshot, doc_id))
+                for snapshot, doc_id, content_length in matching_articles
+            ]
+            sort_articles(matching_articles, sort_by, sort_order)
+        page = matching_articles[offset:] if limit is None else matching_articles[offset:offset + limit]
+    
+    # Snippets are only built for the returned page
+    with timed('snippets'):
+        page = apply_content_mode(page, content_mode, query_terms(query, search_term), fields)
+    
+    # Field projection
+    if fields is not None:
+        page = [project_fields(article, fields) for article in page]
     
     # Prepare final result
     search_result = {
-        "total_articles": len(matching_articles),
+        "total_articles": total_articles,
         "search_term": search_term,
-        "articles": matching_articles
+        "articles": page
     }
     
+    if facet_counts is not None:
+        search_result["facets"] = facet_counts
+    
+    if offset or limit is not None:
+        search_result["offset"] = offset
+        search_result["limit"] = limit
+    
     return search_result
 
 
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+class QueryCache:
+    """
+    LRU cache with a time-to-live for search responses.
+
+    Every entry is tied to the snapshot generation it was computed from.
+    When the article store moves to a new generation (a new scrape landed),
+    the whole cache is dropped on the next access.
+
+    Attributes:
+        hits (int): Number of lookups answered from the cache
+        misses (int): Number of lookups that had to be computed
+    """
+    def __init__(self, max_entries=256, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _sync_generation(self, generation):
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key, generation):
+        """
+        Return the cached value for key, or None on a miss.
+
+        Args:
+            key (tuple): Normalized request parameters
+            generation (int): Current snapshot generation of the article store
+        """
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, generation):
+        """
+        Store a value computed from the given snapshot generation
+        """
+        with self._lock:
+            # A newer snapshot arrived while this value was being computed
+            if self._generation is not None and generation < self._generation:
+                return
+            self._sync_generation(generation)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl
+            }
@@ -0,0 +1,279 @@
+"""
+Boolean query parsing and BM25 ranking for /search.
+
+Query syntax:
+    india pakistan          both terms (implicit AND)
+    india AND pakistan      both terms
+    india OR pakistan       either term
+    india NOT cricket       india without cricket
+    "new delhi"             phrase: the words next to each other in one field
+    (india OR china) AND trade
+
+Operators must be upper case; lower case "and", "or" and "not" are ordinary
+words. NOT binds tighter than AND, which binds tighter than OR. A bare word
+that tokenizes into several tokens (e.g. covid-19) is treated as a phrase.
+"""
+import heapq
+import math
+import re
+from search_index import tokenize
+
+# Relative weight of a BM25 match in each field
+FIELD_WEIGHTS = {
+    'title': 2.0,
+    'summary': 1.0,
+    'full_content': 0.5,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+QUERY_TOKEN_PATTERN = re.compile(r'"([^"]*)"|(\()|(\))|([^\s()"]+)')
+OPERATORS = ('AND', 'OR', 'NOT')
+
+class Term:
+    def __init__(self, token):
+        self.token = token
+
+    def evaluate(self, index, fields):
+        docs = set()
+        for field in fields:
+            docs.update(index.field_postings(field).get(self.token, ()))
+        return docs
+
+    def positive_tokens(self):
+        return [self.token]
+
+class Phrase:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pattern = re.compile(r'\b' + r'\W+'.join(re.escape(token) for token in tokens) + r'\b')
+
+    def evaluate(self, index, fields):
+        # Candidates contain every word; the regex checks that they are adjacent
+        candidates = None
+        for token in set(self.tokens):
+            docs = Term(token).evaluate(index, fields)
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return set()
+        return {
+            doc_id for doc_id in candidates
+            if any(self.pattern.search(str(index.field_value(doc_id, field)).lower()) for field in fields)
+        }
+
+    def positive_tokens(self):
+        return list(self.tokens)
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def evaluate(self, index, fields):
+        return set(range(len(index.articles))) - self.child.evaluate(index, fields)
+
+    def positive_tokens(self):
+        return []
+
+class And:
+    def __init__(self, children):
+        self.children = children
+
+    def evaluate(self, index, fields):
+        positives = [child for child in self.children if not isinstance(child, Not)]
+        negatives = [child.child for child in self.children if isinstance(child, Not)]
+        if positives:
+            docs = None
+            for child in positives:
+                child_docs = child.evaluate(index, fields)
+                docs = child_docs if docs is None else docs & child_docs
+                if not docs:
+                    return set()
+        else:
+            docs = set(range(len(index.articles)))
+        for child in negatives:
+            docs -= child.evaluate(index, fields)
+        return docs
+
+    def positive_tokens(self):
+        return [token for child in self.children for token in child.positive_tokens()]
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+
+    def evaluate(self, index, fields):
+        docs = set()
+        for child in self.children:
+            docs |= child.evaluate(index, fields)
+        return docs
+
+    def positive_tokens(self):
+        return [token for child in self.children for token in child.positive_tokens()]
+
+class Query:
+    """
+    A parsed boolean query.
+
+    Attributes:
+        text (str): The original query string
+        root: Root node of the query tree
+        terms (list): Distinct tokens that contribute to the score, i.e. the
+            words that are not under a NOT
+    """
+    def __init__(self, text, root):
+        self.text = text
+        self.root = root
+        self.terms = list(dict.fromkeys(root.positive_tokens()))
+
+    def matches(self, index, fields):
+        """
+        Return the sorted document ids of the articles that match the query
+        """
+        return sorted(self.root.evaluate(index, fields))
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = []
+        for phrase, open_paren, close_paren, word in QUERY_TOKEN_PATTERN.findall(text):
+            if open_paren or close_paren:
+                self.tokens.append(open_paren or close_paren)
+            elif word in OPERATORS:
+                self.tokens.append(word)
+            else:
+                # Words without any word characters cannot match anything and are dropped
+                words = tokenize(phrase or word)
+                if words:
+                    self.tokens.append(Term(words[0]) if len(words) == 1 else Phrase(words))
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def advance(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Query has no searchable words")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected '{self.peek()}' in query")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.advance()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.advance()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_not(self):
+        if self.peek() == 'NOT':
+            self.advance()
+            return Not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.advance()
+        if token == '(':
+            node = self.parse_or()
+            if self.advance() != ')':
+                raise ValueError("Missing ')' in query")
+            return node
+        if token is None or isinstance(token, str):
+            raise ValueError(f"Expected a word or phrase but found '{token or 'end of query'}'")
+        return token
+
+def parse_query(text):
+    """
+    Parse a boolean search query.
+
+    Args:
+        text (str): Query string
+
+    Returns:
+        Query: The parsed query
+
+    Raises:
+        ValueError: If the query is malformed or has no searchable words
+    """
+    return Query(text, _Parser(text).parse())
+
+class BM25Scorer:
+    """
+    Scores documents with BM25, summed over fields with FIELD_WEIGHTS.
+
+    Document frequencies and document counts are summed over every index
+    being searched, so scores from different snapshots are comparable. Term
+    frequencies and field lengths come from the statistics each
+    InvertedIndex precomputes when it is built.
+    """
+    def __init__(self, indexes, terms, fields, k1=BM25_K1, b=BM25_B):
+        self.terms = terms
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        total_docs = sum(len(index.articles) for index in indexes)
+        self.idf = {}
+        for field in fields:
+            for term in terms:
+                df = sum(len(index.field_postings(field).get(term, ())) for index in indexes)
+                self.idf[field, term] = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+
+    def score_documents(self, index, doc_ids):
+        """
+        Score a set of documents of one index.
+
+        Works term at a time over the precomputed postings, so the cost is
+        proportional to the posting lists of the query terms.
+
+        Args:
+            index (InvertedIndex): Index the documents belong to
+            doc_ids (set): Documents to score
+
+        Returns:
+            dict: doc_id -> score for every document in doc_ids
+        """
+        scores = dict.fromkeys(doc_ids, 0.0)
+        for field in self.fields:
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            stats = index.field_stats(field)
+            lengths = stats.lengths
+            norm = self.k1 * (1 - self.b)
+            scale = self.k1 * self.b / (stats.average_length or 1.0)
+            postings = index.field_postings(field)
+            for term in self.terms:
+                idf = weight * self.idf[field, term]
+                for doc_id, tf in zip(postings.get(term, ()), stats.frequencies.get(term, ())):
+                    if doc_id in scores:
+                        scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm + scale * lengths[doc_id])
+        return scores
+
+def top_k(scored, k, reverse=True):
+    """
+    Select the k best entries of (score, tiebreak, item) tuples with a heap.
+
+    Args:
+        scored (iterable): (score, tiebreak, item) tuples
+        k (int): Number of entries to keep, or None to keep all of them
+        reverse (bool): Highest scores first when True
+
+    Returns:
+        list: The selected tuples, best first
+    """
+    key = lambda entry: (entry[0], entry[1])
+    if k is None:
+        return sorted(scored, key=key, reverse=reverse)
+    select = heapq.nlargest if reverse else heapq.nsmallest
+    return select(k, scored, key=key)
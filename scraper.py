@@ -1,56 +1,235 @@
+import argparse
 import feedparser
+import io
 import json
 from datetime import datetime
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from urllib.parse import urlparse
+import threading
 import traceback
 import os
+from article_store import (notify_snapshot_saved, prune_snapshots, write_manifest,
+                           MAX_RETAINED_SNAPSHOTS, SNAPSHOT_RETENTION_SECONDS)
+from date_utils import normalize_date, format_date
+from dedup import collapse_duplicates, get_detector
+from extractor import extract_text, get_archive
+from fetch_state import FetchState
+from metrics import (timed, ARTICLE_FETCH_SECONDS, BYTES_DOWNLOADED, FEED_FETCH_SECONDS, FEED_PARSE_SECONDS,
+                     SCRAPE_RUNS, ARTICLES_SCRAPED, LAST_SCRAPE_ARTICLES, DUPLICATES_COLLAPSED, FETCH_CACHE_HITS)
+from snapshot_format import COMPACT_SUFFIX, LEGACY_SUFFIX, write_snapshot
 
-def extract_full_content(url):
+# Headers to mimic browser request
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Concurrency limits for full content fetching
+MAX_CONCURRENT_FETCHES = 32  # Global limit across all hosts
+MAX_FETCHES_PER_HOST = 4     # Limit per host so a single site is not hammered
+MAX_CONCURRENT_FEEDS = 8     # Feeds downloaded and parsed at the same time
+FETCH_TIMEOUT = 10
+
+# Keep every downloaded page in scrapes/raw so extraction can be re-run offline
+ARCHIVE_RAW_PAGES = True
+
+# List of RSS feed URLs
+RSS_FEED_URLS = [
+    "https://feeds.feedburner.com/ndtvnews-top-stories",  # NDTV Top Stories RSS feed
+    "https://www.thehindu.com/news/national/feeder/default.rss",  # The Hindu National News RSS feed
+    "https://www.news18.com/commonfeeds/v1/eng/rss/india.xmll",
+    "https://www.livemint.com/rss/news",
+    "https://www.indiatoday.in/rss/home",
+    "https://www.indiatoday.in/rss/1206584",
+    "https://news.un.org/feed/subscribe/en/news/all/rss.xml",
+    "https://www.news18.com/commonfeeds/v1/eng/rss/india.xml",
+    "https://www.news18.com/commonfeeds/v1/eng/rss/movies.xml",
+    "https://www.news18.com/commonfeeds/v1/eng/rss/elections.xml",
+    "https://www.theguardian.com/world/rss",
+    "https://globalnews.ca/feed/",
+    "https://globalnews.ca/world/feed/",
+    "https://feeds.bbci.co.uk/news/world/rss.xml",
+    "https://www.cnbc.com/id/100727362/device/rss/rss.html",
+    "https://abcnews.go.com/abcnews/internationalheadlines",
+    "https://www.aljazeera.com/xml/rss/all.xml",
+    "https://feeds.washingtonpost.com/rss/world",
+    "https://feeds.feedburner.com/time/world",
+    "https://www.washingtontimes.com/rss/headlines/news/world",
+    "https://www.latimes.com/world/rss2.0.xml"
+]
+
+def create_session():
+    """
+    Create the requests Session shared by every fetch thread.
+
+    Its connection pools keep connections alive per host, so repeated
+    requests to the same site skip the TCP/TLS handshake whichever thread
+    sends them. Each host pool holds as many connections as can be in
+    flight at once; ContentFetcher bounds how many of them go to one host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_FETCHES,
+                          pool_maxsize=MAX_CONCURRENT_FETCHES + MAX_CONCURRENT_FEEDS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(REQUEST_HEADERS)
+    return session
+
+_session = create_session()
+
+def get_session():
+    """
+    Return the Session shared by feed and article fetches
+    """
+    return _session
+
+def extract_full_content(url, session=None):
     """
     Extract full content from the article URL
-    Uses requests and BeautifulSoup for web scraping
+    Uses requests for the download and lxml for the extraction (see extractor.py)
+    """
+    with timed(histogram=ARTICLE_FETCH_SECONDS):
+        return _extract_full_content(url, session)
+
+def _extract_full_content(url, session):
+    """
+    Fetches and extracts one article page, see extract_full_content
     """
     try:
-        # Add headers to mimic browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
         # Fetch the webpage
-        response = requests.get(url, headers=headers, timeout=10)
+        if session is None:
+            response = requests.get(url, headers=REQUEST_HEADERS, timeout=FETCH_TIMEOUT)
+        else:
+            response = session.get(url, timeout=FETCH_TIMEOUT)
+        BYTES_DOWNLOADED.inc(len(response.content), kind='article')
         
         # Check if request was successful
         if response.status_code != 200:
             return "Unable to fetch full content"
         
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Try multiple strategies to extract content
-        content_strategies = [
-            lambda: soup.find('article'),  # Look for <article> tag
-            lambda: soup.find('div', class_=lambda x: x and 'content' in x.lower()),
-            lambda: soup.find('div', class_=lambda x: x and 'body' in x.lower()),
-            lambda: soup.find('div', id=lambda x: x and 'content' in x.lower()),
-            lambda: soup.find('body')  # Fallback to entire body
-        ]
+        content_type = response.headers.get('Content-Type')
+        if ARCHIVE_RAW_PAGES:
+            archive_page(url, response.content, content_type)
         
-        # Try each strategy
-        for strategy in content_strategies:
-            content = strategy()
-            if content:
-                # Extract text, clean up
-                text = content.get_text(strip=True, separator=' ')
-                
-                # Limit text length to prevent extremely large outputs
-                return text[:5000] + '...' if len(text) > 5000 else text
-        
-        return "No content could be extracted"
+        with timed('extract'):
+            return extract_text(response.content, content_type)
     
     except Exception as e:
         return f"Error extracting content: {str(e)}"
 
+def archive_page(url, data, content_type):
+    """
+    Stores a downloaded page in the raw page archive, logging instead of
+    failing the extraction
+    """
+    try:
+        get_archive().store(url, data, content_type)
+    except OSError as e:
+        print(f"Error archiving {url}: {e}")
+
+class ContentFetcher:
+    """
+    Fetches the full content of articles on a shared thread pool while more
+    articles are still being added, e.g. as each feed finishes parsing.
+
+    At most per_host_limit requests per host are handed to the pool at a time.
+    The other articles of a busy host wait in a per-host queue, so no worker
+    thread sits blocked on a slow site while other sites have work.
+
+    Args:
+        max_workers (int): Maximum number of requests in flight overall
+        per_host_limit (int): Maximum number of requests in flight per host
+    """
+    def __init__(self, max_workers=MAX_CONCURRENT_FETCHES, per_host_limit=MAX_FETCHES_PER_HOST):
+        self.per_host_limit = per_host_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._condition = threading.Condition()
+        self._queues = {}       # host -> articles waiting for a slot
+        self._in_flight = {}    # host -> requests handed to the pool
+        self._pending = 0
+    
+    def add(self, articles):
+        """
+        Queue articles; their 'full_content' is filled in once fetched
+        """
+        with self._condition:
+            hosts = []
+            for article in articles:
+                host = urlparse(article['link']).netloc.lower()
+                if host not in self._queues:
+                    self._queues[host] = deque()
+                    hosts.append(host)
+                self._queues[host].append(article)
+                self._pending += 1
+            for host in hosts:
+                self._dispatch(host)
+    
+    def _dispatch(self, host):
+        # Called with the condition held
+        queue = self._queues.get(host)
+        while queue and self._in_flight.get(host, 0) < self.per_host_limit:
+            article = queue.popleft()
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            future = self._executor.submit(_fetch_content, article['link'])
+            future.add_done_callback(partial(self._finish, host, article))
+        if host in self._queues and not self._queues[host]:
+            del self._queues[host]
+    
+    def _finish(self, host, article, future):
+        try:
+            article['full_content'] = future.result()
+        except Exception as e:
+            article['full_content'] = f"Error extracting content: {str(e)}"
+        with self._condition:
+            self._in_flight[host] -= 1
+            self._pending -= 1
+            self._dispatch(host)
+            self._condition.notify_all()
+    
+    def wait(self):
+        """
+        Block until every queued article has been fetched
+        """
+        with self._condition:
+            while self._pending:
+                self._condition.wait()
+    
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _fetch_content(url):
+    return extract_full_content(url, session=get_session())
+
+def fetch_full_contents(urls, max_workers=MAX_CONCURRENT_FETCHES, per_host_limit=MAX_FETCHES_PER_HOST):
+    """
+    Extract full content for many article URLs concurrently.
+
+    Args:
+        urls (list): Article URLs
+        max_workers (int): Maximum number of requests in flight overall
+        per_host_limit (int): Maximum number of requests in flight per host
+
+    Returns:
+        list: Extracted content for each URL, in the same order as urls
+    """
+    if not urls:
+        return []
+
+    articles = [{'link': url} for url in urls]
+    with ContentFetcher(min(max_workers, len(urls)), per_host_limit) as fetcher:
+        fetcher.add(articles)
+    return [article['full_content'] for article in articles]
+
 def extract_author(entry):
     """
     Advanced author extraction strategy
@@ -73,13 +252,109 @@ def extract_author(entry):
     
     return 'Unknown author'
 
-def scrape_rss_feed(feed_url):
+def parse_feed_entries(feed_url, state=None):
     """
-    Scrapes articles from a single RSS feed with enhanced extraction
+    Parses a single RSS feed into article dictionaries without full content
+    With a FetchState the feed is requested conditionally, and an unchanged
+    feed (304) is rebuilt from the cached articles
     """
-    # Parse the RSS feed
-    feed = feedparser.parse(feed_url)
+    articles, _ = fetch_feed(feed_url, state)
+    return articles
+
+def download_feed(feed_url, etag=None, modified=None):
+    """
+    Downloads a feed over the pooled session, conditionally when validators
+    from an earlier response are given
+
+    Returns:
+        requests.Response: The response, status 304 when the feed is unchanged
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+    with timed(histogram=FEED_FETCH_SECONDS, feed=feed_url):
+        response = get_session().get(feed_url, headers=headers, timeout=FETCH_TIMEOUT)
+    BYTES_DOWNLOADED.inc(len(response.content), kind='feed')
+    return response
+
+def parse_feed_response(response, feed_url):
+    """
+    Parses a downloaded feed with feedparser, without any further network access
+    """
+    # feedparser expects lowercase header names; Content-Location sets the
+    # base for relative links
+    headers = {name.lower(): value for name, value in response.headers.items()}
+    headers.setdefault('content-location', response.url or feed_url)
+    return feedparser.parse(io.BytesIO(response.content), response_headers=headers)
+
+def fetch_feed(feed_url, state=None):
+    """
+    Downloads and parses a single RSS feed, see parse_feed_entries
+
+    Returns:
+        tuple: (articles, status) where status is 'ok', 'not_modified'
+               (answered from the fetch state) or 'error'
+    """
+    etag, modified = state.feed_validators(feed_url) if state is not None else (None, None)
+    
+    try:
+        response = download_feed(feed_url, etag, modified)
+        if state is not None and response.status_code == 304:
+            cached = state.feed_articles(feed_url)
+            if cached is not None:
+                print(f"Feed not modified: {feed_url}")
+                FETCH_CACHE_HITS.inc(kind='feed')
+                return cached, 'not_modified'
+            # Some cached articles were dropped, so download the feed again
+            response = download_feed(feed_url)
+    except requests.RequestException as e:
+        print(f"Error downloading the feed: {feed_url}: {e}")
+        return [], 'error'
     
+    if response.status_code != 200:
+        print(f"Error downloading the feed: {feed_url}: HTTP {response.status_code}")
+        return [], 'error'
+    
+    with timed(histogram=FEED_PARSE_SECONDS, feed=feed_url):
+        feed = parse_feed_response(response, feed_url)
+        articles = _feed_articles(feed, feed_url)
+    
+    if feed.bozo:
+        return articles, 'error'
+    if state is not None:
+        state.record_feed(feed_url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                          [article['link'] for article in articles])
+    return articles, 'ok'
+
+def fetch_feeds(feed_urls, state=None, max_workers=MAX_CONCURRENT_FEEDS):
+    """
+    Downloads and parses feeds concurrently, see fetch_feed
+
+    Each worker downloads a feed and parses it, so one slow feed only holds
+    up its own worker.
+
+    Yields:
+        tuple: (feed_url, articles, status) in the order the feeds finish
+    """
+    if not feed_urls:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(feed_urls))) as executor:
+        futures = {executor.submit(fetch_feed, feed_url, state): feed_url for feed_url in feed_urls}
+        for future in as_completed(futures):
+            feed_url = futures[future]
+            try:
+                articles, status = future.result()
+            except Exception as e:
+                print(f"Error scraping feed {feed_url}: {e}")
+                articles, status = [], 'error'
+            yield feed_url, articles, status
+
+def _feed_articles(feed, feed_url):
+    """
+    Turns the entries of a parsed feed into article dictionaries
+    """
     # Check if the feed was successfully parsed
     if feed.bozo:
         print(f"Error parsing the feed: {feed_url}")
@@ -121,23 +396,19 @@ def scrape_rss_feed(feed_url):
             # Convert published date
             published = entry.get('published') or entry.get('updated')
             if published:
-                try:
-                    # Try parsing with various methods
-                    published_date = datetime(*entry.published_parsed[:6]).strftime('%Y-%m-%d %H:%M:%S') if hasattr(entry, 'published_parsed') else published
-                except:
-                    published_date = str(published)
+                # Normalize once here so searches never have to guess the format
+                parsed = (normalize_date(entry.get('published_parsed') or entry.get('updated_parsed'))
+                          or normalize_date(str(published)))
+                published_date = format_date(parsed) if parsed else str(published)
             else:
                 published_date = 'No published date available'
             
-            # Extract full content
-            full_content = extract_full_content(link)
-            
-            # Compile the article information
+            # Compile the article information, full content is filled in later
             article_info = {
                 'title': title,
                 'link': link,
                 'summary': summary,
-                'full_content': full_content,
+                'full_content': None,
                 'published_date': published_date,
                 'author': author,
                 'source': source_title,
@@ -152,25 +423,82 @@ def scrape_rss_feed(feed_url):
     
     return articles
 
-def scrape_multiple_feeds(feed_urls):
+def use_cached_content(articles, state):
+    """
+    Fills in content extracted in an earlier run from the fetch state
+
+    Returns:
+        list: The articles that still need their content fetched
+    """
+    if state is None:
+        return list(articles)
+    
+    missing = []
+    for article in articles:
+        cached = state.cached_content(article['link'])
+        if cached is not None:
+            article['full_content'] = cached
+        else:
+            missing.append(article)
+    
+    if len(missing) < len(articles):
+        FETCH_CACHE_HITS.inc(len(articles) - len(missing), kind='article')
+    return missing
+
+def fill_full_content(articles, state=None):
+    """
+    Fetches the full content of every article concurrently and stores it in place
+    With a FetchState, articles whose content was extracted in an earlier run
+    are not fetched again, and every article is recorded in the state
+    """
+    missing = use_cached_content(articles, state)
+    
+    contents = fetch_full_contents([article['link'] for article in missing])
+    for article, full_content in zip(missing, contents):
+        article['full_content'] = full_content
+    
+    if state is not None:
+        for article in articles:
+            state.record_article(article)
+    return articles
+
+def scrape_rss_feed(feed_url, state=None):
+    """
+    Scrapes articles from a single RSS feed with enhanced extraction
+    """
+    return fill_full_content(parse_feed_entries(feed_url, state), state)
+
+def scrape_multiple_feeds(feed_urls, state=None):
     """
     Scrapes articles from multiple RSS feeds and combines them into a single list
+    Feeds are downloaded and parsed concurrently, and the articles of each
+    feed start downloading as soon as that feed is parsed
     """
-    all_articles = []
+    by_feed = {}
     
-    for feed_url in feed_urls:
-        print(f"Fetching data from: {feed_url}")
-        try:
-            articles = scrape_rss_feed(feed_url)
-            all_articles.extend(articles)
-        except Exception as e:
-            print(f"Error scraping feed {feed_url}: {e}")
+    print(f"Fetching {len(feed_urls)} feeds")
+    with ContentFetcher() as fetcher:
+        for feed_url, articles, status in fetch_feeds(feed_urls, state):
+            print(f"Fetched {len(articles)} entries ({status}) from: {feed_url}")
+            by_feed[feed_url] = articles
+            fetcher.add(use_cached_content(articles, state))
+        print(f"Waiting for the full content of {sum(map(len, by_feed.values()))} articles")
     
+    # Keep the articles in feed order, whatever order the feeds finished in
+    all_articles = [article for feed_url in feed_urls for article in by_feed.get(feed_url, [])]
+    if state is not None:
+        for article in all_articles:
+            state.record_article(article)
     return all_articles
 
-def save_to_json(data, base_filename='articles'):
+def save_to_json(data, base_filename='articles', compact=True, publish=False):
     """
     Saves the article data to a JSON file with timestamped filename
+    By default the compact gzip JSON Lines format from snapshot_format is used,
+    compact=False writes the legacy indented .json file
+    With publish=True the snapshot is also swapped into this process's article
+    store, for the scraper embedded in the web server. Other processes leave it
+    to the server to pick up the new file.
     """
     try:
         # Create 'scrapes' directory if it doesn't exist
@@ -180,49 +508,127 @@ def save_to_json(data, base_filename='articles'):
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         
         # Create full filename with timestamp
-        filename = os.path.join('scrapes', f'{base_filename}_{timestamp}.json')
+        suffix = COMPACT_SUFFIX if compact else LEGACY_SUFFIX
+        filename = os.path.join('scrapes', f'{base_filename}_{timestamp}{suffix}')
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        if compact:
+            write_snapshot(filename, data)
+        else:
+            # Write to a temporary file first so readers never see a partial snapshot
+            tmp_filename = filename + '.tmp'
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_filename, filename)
         
         print(f"Successfully saved {len(data)} articles to {filename}")
+        
+        # Record the snapshot's date span so date-range searches can skip it
+        write_manifest(filename, data)
+        
+        # Let the in-process article store serve the new snapshot right away
+        if publish:
+            notify_snapshot_saved(filename)
         return filename
     except Exception as e:
         print(f"Error saving to JSON: {e}")
         return None
 
-def main():
-    # List of RSS feed URLs
-    rss_feed_urls = [
-        "https://feeds.feedburner.com/ndtvnews-top-stories",  # NDTV Top Stories RSS feed
-        "https://www.thehindu.com/news/national/feeder/default.rss",  # The Hindu National News RSS feed
-        "https://www.news18.com/commonfeeds/v1/eng/rss/india.xmll",
-        "https://www.livemint.com/rss/news",
-        "https://www.indiatoday.in/rss/home",
-        "https://www.indiatoday.in/rss/1206584",
-        "https://news.un.org/feed/subscribe/en/news/all/rss.xml",
-        "https://www.news18.com/commonfeeds/v1/eng/rss/india.xml",
-        "https://www.news18.com/commonfeeds/v1/eng/rss/movies.xml",
-        "https://www.news18.com/commonfeeds/v1/eng/rss/elections.xml",
-        "https://www.theguardian.com/world/rss",
-        "https://globalnews.ca/feed/",
-        "https://globalnews.ca/world/feed/",
-        "https://feeds.bbci.co.uk/news/world/rss.xml",
-        "https://www.cnbc.com/id/100727362/device/rss/rss.html",
-        "https://abcnews.go.com/abcnews/internationalheadlines",
-        "https://www.aljazeera.com/xml/rss/all.xml",
-        "https://feeds.washingtonpost.com/rss/world",
-        "https://feeds.feedburner.com/time/world",
-        "https://www.washingtontimes.com/rss/headlines/news/world",
-        "https://www.latimes.com/world/rss2.0.xml"
+def remove_duplicates(articles):
+    """
+    Collapses near-duplicate articles against this scrape and earlier ones,
+    keeping the scrape as it is if detection fails
+    """
+    try:
+        with timed('dedup'):
+            detector = get_detector()
+            collapsed = collapse_duplicates(articles, detector)
+            detector.prune()
+            detector.save()
+    except Exception as e:
+        print(f"Error removing duplicates: {e}")
+        return articles
+    
+    DUPLICATES_COLLAPSED.inc(len(articles) - len(collapsed))
+    print(f"Collapsed {len(articles) - len(collapsed)} duplicate articles")
+    return collapsed
 
-    ]
+def save_fetch_state(state):
+    """
+    Prunes and saves the fetch state, logging instead of failing the scrape
+    The raw page archive is kept for as long as the fetch state
+    """
+    try:
+        state.prune()
+        state.save()
+        get_archive().prune()
+    except Exception as e:
+        print(f"Error saving fetch state: {e}")
+
+def prune_old_snapshots(max_age=SNAPSHOT_RETENTION_SECONDS, max_snapshots=MAX_RETAINED_SNAPSHOTS):
+    """
+    Deletes snapshots beyond the retention window with their sidecars,
+    logging instead of failing the scrape
+    """
+    try:
+        prune_snapshots(max_age=max_age, max_snapshots=max_snapshots)
+    except OSError as e:
+        print(f"Error pruning snapshots: {e}")
+
+def save_snapshot(articles, precompute_embeddings=False, embedding_dtype='float32', publish=False):
+    """
+    Collapses duplicates, saves a snapshot of the articles and optionally
+    precomputes its embeddings. publish is passed on to save_to_json.
+
+    Returns:
+        str: Path of the saved snapshot, or None if saving failed
+    """
+    # Merge copies of the same story carried by several feeds
+    articles = remove_duplicates(articles)
+    
+    # Save the articles to a JSON file with timestamp
+    with timed('save_snapshot'):
+        filename = save_to_json(articles, publish=publish)
+    
+    SCRAPE_RUNS.inc()
+    ARTICLES_SCRAPED.inc(len(articles))
+    LAST_SCRAPE_ARTICLES.set(len(articles))
+    
+    # Optionally embed every article once so searches don't have to,
+    # and assign the articles to the stories served by /stories
+    if precompute_embeddings and filename:
+        try:
+            from cluster import precompute_embeddings as embed_snapshot
+            with timed('precompute_embeddings'):
+                vectors_path = embed_snapshot(filename, articles, dtype=embedding_dtype)
+        except Exception as e:
+            print(f"Error precomputing embeddings: {e}")
+        else:
+            try:
+                import numpy as np
+                from stories import update_stories
+                with timed('update_stories'):
+                    update_stories(articles, np.load(vectors_path))
+            except Exception as e:
+                print(f"Error updating stories: {e}")
+    
+    return filename
+
+def main(precompute_embeddings=False, embedding_dtype='float32', publish=False):
+    # Feed validators and articles known from earlier runs
+    state = FetchState()
     
     # Scrape the articles from multiple feeds
-    articles = scrape_multiple_feeds(rss_feed_urls)
+    with timed('scrape_feeds'):
+        articles = scrape_multiple_feeds(RSS_FEED_URLS, state)
+    save_fetch_state(state)
     
-    # Save the articles to a JSON file with timestamp
-    save_to_json(articles)
+    filename = save_snapshot(articles, precompute_embeddings, embedding_dtype, publish)
+    prune_old_snapshots()
+    return filename
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape RSS feeds into the scrapes directory")
+    parser.add_argument('--embed', action='store_true', help="Precompute article embeddings after scraping")
+    parser.add_argument('--float16', action='store_true', help="Store precomputed embeddings as float16")
+    args = parser.parse_args()
+    main(precompute_embeddings=args.embed, embedding_dtype='float16' if args.float16 else 'float32')
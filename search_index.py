@@ -0,0 +1,283 @@
+import re
+import threading
+import numpy as np
+from collections import Counter
+from bisect import bisect_left, bisect_right
+from date_utils import parse_date
+
+# Matches the word runs that \b boundaries are placed around
+TOKEN_PATTERN = re.compile(r'\w+')
+
+DEFAULT_FIELDS = ('title', 'summary')
+
+# Facets counted by FacetIndex; 'day' is the parsed publish date
+FACET_FIELDS = ('source', 'author', 'day')
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Word tokens in order of appearance
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+class FieldStats:
+    """
+    Term statistics of one indexed field, used for BM25 ranking.
+
+    Attributes:
+        frequencies (dict): token -> term frequencies, aligned with the
+            token's posting list
+        lengths (list): Number of tokens in the field of each document
+        average_length (float): Mean of lengths
+    """
+    def __init__(self, frequencies, lengths):
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+class FieldOffsets:
+    """
+    Character offsets of every token of one field, for snippets and highlighting.
+
+    Tokens are stored as ids into a vocabulary, in flat arrays with one slice
+    per document, so the matches of a set of terms in a document are found
+    with one vectorized comparison instead of a rescan of its text.
+    """
+    def __init__(self, texts):
+        self.vocabulary = {}
+        ids, starts, ends = [], [], []
+        self.bounds = [0]
+        for text in texts:
+            for match in TOKEN_PATTERN.finditer(text):
+                ids.append(self.vocabulary.setdefault(match.group().lower(), len(self.vocabulary)))
+                starts.append(match.start())
+                ends.append(match.end())
+            self.bounds.append(len(ids))
+        self.ids = np.array(ids, dtype=np.int32)
+        self.starts = np.array(starts, dtype=np.int32)
+        self.ends = np.array(ends, dtype=np.int32)
+
+    def document(self, doc_id):
+        """
+        Return the (ids, starts, ends) arrays of one document's tokens
+        """
+        start, end = self.bounds[doc_id], self.bounds[doc_id + 1]
+        return self.ids[start:end], self.starts[start:end], self.ends[start:end]
+
+    def term_ids(self, terms):
+        """
+        Return the vocabulary ids of the terms that occur in the field
+        """
+        return [self.vocabulary[term] for term in terms if term in self.vocabulary]
+
+class InvertedIndex:
+    """
+    Token-level inverted index over a list of articles.
+
+    A term made only of word characters matches an article with the
+    whole-word regex exactly when it is one of the article's tokens, so the
+    posting list is the answer. Any other term (e.g. "covid-19") can only
+    match articles containing all of its word runs as tokens, so the
+    intersection of their posting lists is a candidate set that the caller
+    must verify with the regex.
+
+    Title and summary are indexed up front. Other fields, such as
+    full_content, are indexed the first time a query asks for them.
+    Term frequencies and field lengths are kept next to the postings
+    for ranking (see query_engine.py), and token offsets are computed per
+    field on first use for snippets (see snippets.py).
+
+    Fields that are not kept in the article dictionaries, such as the
+    full_content of snapshots loaded without bodies, are read through
+    readers: field -> function returning the value of a document id.
+    """
+    def __init__(self, articles, fields=DEFAULT_FIELDS, readers=None):
+        self.articles = articles
+        self._readers = readers or {}
+        self._postings = {}
+        self._stats = {}
+        self._offsets = {}
+        self._lock = threading.Lock()
+        for field in fields:
+            self._postings[field], self._stats[field] = self._build_field(field)
+
+    def field_value(self, doc_id, field):
+        """
+        Return the value of a field of a document, as stored
+        """
+        reader = self._readers.get(field)
+        if reader is not None:
+            return reader(doc_id)
+        return self.articles[doc_id].get(field, '')
+
+    def _build_field(self, field):
+        """
+        Build the token -> sorted document id list mapping for a field,
+        along with its term statistics
+        """
+        postings = {}
+        frequencies = {}
+        lengths = []
+        for doc_id in range(len(self.articles)):
+            tokens = tokenize(str(self.field_value(doc_id, field)))
+            lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                postings.setdefault(token, []).append(doc_id)
+                frequencies.setdefault(token, []).append(count)
+        return postings, FieldStats(frequencies, lengths)
+
+    def _ensure_field(self, field):
+        if field not in self._postings:
+            with self._lock:
+                if field not in self._postings:
+                    postings, stats = self._build_field(field)
+                    self._stats[field] = stats
+                    self._postings[field] = postings
+
+    def field_postings(self, field):
+        """
+        Return the postings for a field, indexing it on first use
+        """
+        self._ensure_field(field)
+        return self._postings[field]
+
+    def field_stats(self, field):
+        """
+        Return the term statistics for a field, indexing it on first use
+        """
+        self._ensure_field(field)
+        return self._stats[field]
+
+    def field_offsets(self, field):
+        """
+        Return the token offsets for a field, computing them on first use
+        """
+        if field not in self._offsets:
+            with self._lock:
+                if field not in self._offsets:
+                    self._offsets[field] = FieldOffsets(
+                        str(self.field_value(doc_id, field) or '') for doc_id in range(len(self.articles))
+                    )
+        return self._offsets[field]
+
+    def lookup(self, search_term, fields=DEFAULT_FIELDS):
+        """
+        Find the articles that can match a whole-word search.
+
+        Args:
+            search_term (str): Term to search for
+            fields (tuple): Article fields that are searched
+
+        Returns:
+            tuple: (doc_ids, exact) where doc_ids is a sorted list of
+                   candidate document ids and exact tells whether every
+                   candidate is a match. doc_ids is None when the term has
+                   no word characters and every article must be scanned.
+        """
+        term = search_term.lower()
+        tokens = set(tokenize(term))
+        if not tokens:
+            return None, False
+
+        field_postings = [self.field_postings(field) for field in fields]
+        matches = None
+        for token in tokens:
+            docs = set()
+            for postings in field_postings:
+                docs.update(postings.get(token, ()))
+            matches = docs if matches is None else matches & docs
+            if not matches:
+                return [], True
+
+        exact = TOKEN_PATTERN.fullmatch(term) is not None
+        return sorted(matches), exact
+
+class DateIndex:
+    """
+    Publish dates of a list of articles, parsed once and kept sorted.
+
+    Date filters become binary searches over the sorted dates, and sorting
+    by date reads the parsed value instead of parsing the string again.
+    """
+    def __init__(self, articles):
+        self.dates = [parse_date(article.get('published_date', '')) for article in articles]
+        dated = sorted(
+            (article_date.toordinal(), doc_id)
+            for doc_id, article_date in enumerate(self.dates)
+            if article_date
+        )
+        self._ordinals = [ordinal for ordinal, _ in dated]
+        self._doc_ids = [doc_id for _, doc_id in dated]
+
+    def docs_between(self, date_from=None, date_to=None):
+        """
+        Find the articles published between two dates, inclusive.
+
+        Args:
+            date_from (date, optional): Earliest publish date
+            date_to (date, optional): Latest publish date
+
+        Returns:
+            set: Document ids of the articles in the range. Articles without
+                 a parseable date are never included.
+        """
+        start = 0 if date_from is None else bisect_left(self._ordinals, date_from.toordinal())
+        end = len(self._ordinals) if date_to is None else bisect_right(self._ordinals, date_to.toordinal())
+        return set(self._doc_ids[start:end])
+
+class FacetIndex:
+    """
+    Precomputed facet tables of a list of articles.
+
+    Every facet maps each article to a small integer code for its value, so
+    counting the values of any set of matching articles is a single bincount
+    over their codes, without touching the articles themselves. Articles
+    with no value for a facet (an empty source or author, an unparseable
+    publish date) are left out of its counts.
+
+    Attributes:
+        values (dict): facet -> list of distinct values, indexed by code
+    """
+    def __init__(self, articles, dates):
+        self.values = {}
+        self._codes = {}
+        self._totals = {}
+        for facet in FACET_FIELDS:
+            if facet == 'day':
+                keys = [article_date.isoformat() if article_date else '' for article_date in dates]
+            else:
+                keys = [str(article.get(facet) or '').strip() for article in articles]
+            codes = {}
+            for key in keys:
+                if key and key not in codes:
+                    codes[key] = len(codes)
+            self.values[facet] = list(codes)
+            self._codes[facet] = np.array([codes.get(key, -1) for key in keys], dtype=np.int32)
+            self._totals[facet] = self._count(self._codes[facet], len(codes))
+
+    @staticmethod
+    def _count(codes, size):
+        return np.bincount(codes[codes >= 0], minlength=size)
+
+    def counts(self, facet, doc_ids=None):
+        """
+        Count the values of a facet among some articles.
+
+        Args:
+            facet (str): One of FACET_FIELDS
+            doc_ids (list, optional): Document ids to count, all articles if omitted
+
+        Returns:
+            dict: value -> number of articles, only for values that occur
+        """
+        if doc_ids is None:
+            counts = self._totals[facet]
+        else:
+            counts = self._count(self._codes[facet][np.asarray(doc_ids, dtype=np.intp)], len(self.values[facet]))
+        values = self.values[facet]
+        return {values[code]: int(counts[code]) for code in np.flatnonzero(counts)}
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+import numpy as np
+from article_store import get_store
+from snapshot_format import content_length, load_articles_lazy
+from cluster import DEFAULT_MODEL_NAME, embed_texts, embedding_paths, load_embeddings, normalize_rows
+from news_search_module import parse_date, format_article, sort_articles
+
+class SnapshotVectors:
+    """
+    The articles of one snapshot that have a precomputed embedding, with
+    their unit-normalized vectors.
+
+    Vectors are matched to articles by link through the sidecar's row
+    mapping, so the alignment does not depend on the order of either file.
+    Articles are loaded without their bodies.
+
+    Args:
+        path (str): Snapshot path
+        vectors (np.array): Embeddings from the snapshot's sidecar
+        rows (dict): Sidecar row of each article link
+    """
+    def __init__(self, path, vectors, rows):
+        articles, self.contents = load_articles_lazy(path)
+        self.articles = []
+        self.positions = []     # Position of each article in the snapshot
+        matched_rows = []
+        for position, article in enumerate(articles):
+            row = rows.get(article.get('link', ''))
+            if row is None or row >= len(vectors):
+                continue
+            self.articles.append(article)
+            self.positions.append(position)
+            matched_rows.append(row)
+
+        self.matrix = normalize_rows(vectors[matched_rows])
+
+class SemanticIndex:
+    """
+    Unit-normalized article vectors from the precomputed embeddings of every
+    retained snapshot.
+
+    Articles are deduplicated by link, keeping the copy from the newest
+    snapshot. Snapshots without an embeddings sidecar are skipped. Articles
+    are loaded without their bodies; content(doc_id) reads one on demand.
+
+    Args:
+        snapshot_paths (list): Snapshot paths, newest first
+        model_name (str): Embedding model of the sidecars to use
+        previous (SemanticIndex, optional): Index to reuse the loaded
+            snapshots of, so only new or re-embedded snapshots are read
+    """
+    def __init__(self, snapshot_paths, model_name=DEFAULT_MODEL_NAME, previous=None):
+        self.articles = []
+        self._contents = []     # (SnapshotContents, position) of each article
+        self._snapshots = {}    # path -> (sidecar, SnapshotVectors)
+        reusable = previous._snapshots if previous is not None and previous.model_name == model_name else {}
+        self.model_name = model_name
+        blocks = []
+        seen_links = set()
+
+        for path in snapshot_paths:
+            sidecar = load_embeddings(path, model_name)
+            if sidecar is None:
+                continue
+            cached = reusable.get(path)
+            # load_embeddings returns the same vectors while the sidecar is unchanged
+            if cached is not None and cached[0][0] is sidecar[0]:
+                snapshot = cached[1]
+            else:
+                snapshot = SnapshotVectors(path, *sidecar)
+            self._snapshots[path] = (sidecar, snapshot)
+
+            keep = []
+            for idx, article in enumerate(snapshot.articles):
+                link = article.get('link', '')
+                if link in seen_links:
+                    continue
+                seen_links.add(link)
+                keep.append(idx)
+                self.articles.append(article)
+                self._contents.append((snapshot.contents, snapshot.positions[idx]))
+            if keep:
+                blocks.append(snapshot.matrix[keep])
+
+        self.matrix = np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+        # Filter columns, computed once per index instead of per query
+        self.content_lengths = np.array(
+            [content_length(article) for article in self.articles],
+            dtype=np.int64
+        )
+        self.dates = [parse_date(article.get('published_date', '')) for article in self.articles]
+        self.date_ordinals = np.array(
+            [article_date.toordinal() if article_date else -1 for article_date in self.dates],
+            dtype=np.int64
+        )
+
+    def content(self, doc_id):
+        """
+        Return the full_content of an article
+        """
+        contents, position = self._contents[doc_id]
+        return contents.read(position)
+
+    def search(self, query_vector, k=20, min_length=0, max_length=float('inf'), filter_date=None):
+        """
+        Rank articles by cosine similarity to a query embedding.
+
+        Args:
+            query_vector (np.array): Query embedding
+            k (int): Number of results to return
+            min_length (int): Minimum article length to include
+            max_length (int): Maximum article length to include
+            filter_date (date): Specific date to filter articles
+
+        Returns:
+            list: (doc_id, score) pairs, best first
+        """
+        if not self.articles or k <= 0:
+            return []
+
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector = query_vector / norm
+
+        scores = self.matrix @ query_vector
+
+        # Filtered out articles can never reach the top-k
+        allowed = (self.content_lengths >= min_length) & (self.content_lengths <= max_length)
+        if filter_date is not None:
+            allowed &= self.date_ordinals == filter_date.toordinal()
+        candidates = np.flatnonzero(allowed)
+        if len(candidates) == 0:
+            return []
+
+        k = min(k, len(candidates))
+        candidate_scores = scores[candidates]
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+        top = top[np.argsort(-candidate_scores[top], kind='stable')]
+        return [(int(candidates[idx]), float(candidate_scores[idx])) for idx in top]
+
+
+_index = None
+_index_key = None
+_index_checked = 0.0
+_index_lock = threading.Lock()
+
+# Seconds between checks for new snapshots or embeddings
+INDEX_POLL_INTERVAL = 5.0
+
+def get_semantic_index(model_name=DEFAULT_MODEL_NAME):
+    """
+    Return the process-wide SemanticIndex, rebuilding it when snapshots or
+    their embeddings change. Snapshots already loaded by the previous index
+    are reused, so a rebuild only reads the new ones.
+    """
+    global _index, _index_key, _index_checked
+    if _index is not None and time.monotonic() - _index_checked < INDEX_POLL_INTERVAL:
+        return _index
+
+    with _index_lock:
+        if _index is not None and time.monotonic() - _index_checked < INDEX_POLL_INTERVAL:
+            return _index
+
+        paths = get_store().snapshot_paths()
+        key = []
+        for path in paths:
+            vectors_path, _ = embedding_paths(path)
+            if os.path.exists(vectors_path):
+                key.append((path, os.path.getmtime(vectors_path)))
+        key = (model_name, tuple(key))
+
+        if _index is None or key != _index_key:
+            _index = SemanticIndex([path for path, _ in key[1]], model_name, previous=_index)
+            _index_key = key
+        _index_checked = time.monotonic()
+        return _index
+
+def semantic_search(query, k=20, sort_by='relevance', sort_order='desc',
+                    min_length=0, max_length=float('inf'), filter_date=None):
+    """
+    Search articles by meaning rather than exact words.
+
+    The query is embedded once and compared against the precomputed article
+    vectors of all retained snapshots.
+
+    Args:
+        query (str): Free-text query
+        k (int, optional): Number of results to return
+        sort_by (str, optional): 'relevance', 'date' or 'length'
+        sort_order (str, optional): 'asc' or 'desc' (ignored for 'relevance')
+        min_length (int, optional): Minimum article length to include
+        max_length (int, optional): Maximum article length to include
+        filter_date (str or date, optional): Specific date to filter articles
+
+    Returns:
+        dict: Results in the same format as search_news, with a 'score' per article
+    """
+    query = query.strip()
+    if isinstance(filter_date, str):
+        filter_date = parse_date(filter_date)
+
+    index = get_semantic_index()
+    if not index.articles:
+        return {
+            "search_term": query,
+            "total_articles": 0,
+            "articles": [],
+            "error": "No precomputed embeddings found"
+        }
+
+    query_vector = embed_texts([query])[0]
+    hits = index.search(query_vector, k=k, min_length=min_length, max_length=max_length, filter_date=filter_date)
+
+    results = []
+    for doc_id, score in hits:
+        result = format_article(index.articles[doc_id], int(index.content_lengths[doc_id]), index.dates[doc_id])
+        result["full_content"] = index.content(doc_id)
+        result["score"] = round(score, 4)
+        results.append(result)
+    sort_articles(results, sort_by, sort_order)
+
+    return {
+        "total_articles": len(results),
+        "search_term": query,
+        "articles": results
+    }
@@ -0,0 +1,298 @@
+"""
+Compact snapshot storage for scraped articles.
+
+A snapshot is stored as two files:
+
+    articles_<timestamp>.jsonl.gz   gzip JSON Lines, one article per line
+                                    with full_content left out
+    articles_<timestamp>.content    blob segment holding each article's
+                                    full_content as a zlib-compressed block
+
+Each line keeps the article's keys in their original order. full_content is
+null and "_content": [offset, size, length] points into the blob segment.
+This lets readers scan titles and summaries line by line without reading any
+article body. load_articles_lazy loads a snapshot that way and returns a
+SnapshotContents that reads single bodies from the blob by their offsets,
+which is how the article store and the semantic index consume snapshots.
+
+Legacy indent=4 .json snapshots can be read through the same functions and
+converted with:
+
+    python snapshot_format.py scrapes/*.json
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import threading
+import zlib
+
+COMPACT_SUFFIX = '.jsonl.gz'
+CONTENT_SUFFIX = '.content'
+LEGACY_SUFFIX = '.json'
+
+def snapshot_base(path):
+    """
+    Return the snapshot path without its format suffix.
+    Sidecar files (content blob, embeddings) are named after this base.
+    """
+    for suffix in (COMPACT_SUFFIX, LEGACY_SUFFIX):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return os.path.splitext(path)[0]
+
+def is_snapshot_file(name):
+    """
+    Tell whether a file in the scrapes directory is an article snapshot
+    (as opposed to a sidecar such as precomputed embeddings)
+    """
+    for suffix in (COMPACT_SUFFIX, LEGACY_SUFFIX):
+        # Sidecars add their own suffix before the extension (.emb.json, .meta.json)
+        if name.endswith(suffix) and '.' not in name[:-len(suffix)]:
+            return True
+    return False
+
+def write_snapshot(path, articles):
+    """
+    Write articles in the compact format.
+
+    The blob segment is moved into place before the line file, so a reader
+    that sees the line file always finds a complete blob.
+
+    Args:
+        path (str): Destination path ending in .jsonl.gz
+        articles (list): Article dictionaries
+    """
+    content_path = snapshot_base(path) + CONTENT_SUFFIX
+    offset = 0
+    try:
+        with open(content_path + '.tmp', 'wb') as blob, \
+                gzip.open(path + '.tmp', 'wt', encoding='utf-8') as lines:
+            for article in articles:
+                record = dict(article)
+                full_content = record.get('full_content')
+                if isinstance(full_content, str):
+                    block = zlib.compress(full_content.encode('utf-8'))
+                    blob.write(block)
+                    record['full_content'] = None
+                    record['_content'] = [offset, len(block), len(full_content)]
+                    offset += len(block)
+                lines.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+    except BaseException:
+        # Leave no partial files behind
+        for tmp_path in (content_path + '.tmp', path + '.tmp'):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    os.replace(content_path + '.tmp', content_path)
+    os.replace(path + '.tmp', path)
+
+def _iter_records(path):
+    """
+    Yield (article, pointer) pairs in snapshot order. pointer is the
+    [offset, size, length] of the article's full_content in the blob segment,
+    or None when full_content is stored in the article itself.
+    """
+    if not path.endswith(COMPACT_SUFFIX):
+        # Legacy files can only be parsed as a whole
+        with open(path, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+        for article in articles:
+            yield article, None
+        return
+
+    with gzip.open(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            article = json.loads(line)
+            yield article, article.pop('_content', None)
+
+def _strip_content(article, pointer):
+    # Body-less form: full_content is None and 'content_length' holds its length
+    article['content_length'] = len(str(article.get('full_content', ''))) if pointer is None else pointer[2]
+    article['full_content'] = None
+    return article
+
+def content_length(article):
+    """
+    Return the length of an article's full_content, also for articles read
+    without it
+    """
+    if 'content_length' in article:
+        return article['content_length']
+    return len(str(article.get('full_content', '')))
+
+def iter_articles(path, with_content=True):
+    """
+    Stream the articles of a snapshot one at a time.
+
+    Args:
+        path (str): Snapshot path (.jsonl.gz or legacy .json)
+        with_content (bool): Read full_content from the blob segment. When
+            False, full_content is None and 'content_length' holds its length.
+
+    Yields:
+        dict: Article dictionaries in snapshot order
+    """
+    blob = open(snapshot_base(path) + CONTENT_SUFFIX, 'rb') if with_content and path.endswith(COMPACT_SUFFIX) else None
+    try:
+        for article, pointer in _iter_records(path):
+            if not with_content:
+                _strip_content(article, pointer)
+            elif pointer is not None:
+                offset, size, _ = pointer
+                blob.seek(offset)
+                article['full_content'] = zlib.decompress(blob.read(size)).decode('utf-8')
+            yield article
+    finally:
+        if blob is not None:
+            blob.close()
+
+class SnapshotContents:
+    """
+    Reads the full_content of single articles of a snapshot on demand.
+
+    The blob segment is opened when the snapshot is loaded, so bodies can
+    still be read if the snapshot is deleted or rewritten afterwards.
+    Contents stored in the articles themselves (legacy .json snapshots) are
+    kept in memory.
+
+    Args:
+        path (str): Snapshot path (.jsonl.gz or legacy .json)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._pointers = []
+        self._inline = {}
+        self._lock = threading.Lock()
+        self._blob = open(snapshot_base(path) + CONTENT_SUFFIX, 'rb') if path.endswith(COMPACT_SUFFIX) else None
+
+    def __len__(self):
+        return len(self._pointers)
+
+    def __del__(self):
+        if getattr(self, '_blob', None) is not None:
+            self._blob.close()
+
+    def add(self, article, pointer):
+        """
+        Record where the full_content of the next article is stored
+        """
+        if pointer is None:
+            self._inline[len(self._pointers)] = article.get('full_content', '')
+        self._pointers.append(pointer)
+
+    def read(self, position):
+        """
+        Return the full_content of the article at a position, as stored
+        """
+        pointer = self._pointers[position]
+        if pointer is None:
+            return self._inline[position]
+        offset, size, _ = pointer
+        with self._lock:
+            self._blob.seek(offset)
+            block = self._blob.read(size)
+        return zlib.decompress(block).decode('utf-8')
+
+def load_articles_lazy(path):
+    """
+    Read the articles of a snapshot without any article body.
+
+    Returns:
+        tuple: (articles, contents) where the articles are in the form
+               iter_articles(path, with_content=False) yields and contents is
+               a SnapshotContents that reads each full_content on demand
+    """
+    contents = SnapshotContents(path)
+    articles = []
+    for article, pointer in _iter_records(path):
+        contents.add(article, pointer)
+        articles.append(_strip_content(article, pointer))
+    return articles, contents
+
+def load_articles(path):
+    """
+    Read every article of a snapshot, including full_content.
+    """
+    if path.endswith(COMPACT_SUFFIX):
+        return list(iter_articles(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def read_article(path, position):
+    """
+    Read one article of a snapshot, including full_content, without parsing
+    the lines before it.
+
+    Args:
+        path (str): Snapshot path (.jsonl.gz or legacy .json)
+        position (int): Position of the article in the snapshot
+
+    Returns:
+        dict: The article, or None if the snapshot has fewer articles
+    """
+    if not path.endswith(COMPACT_SUFFIX):
+        articles = load_articles(path)
+        return articles[position] if position < len(articles) else None
+
+    with gzip.open(path, 'rt', encoding='utf-8') as lines:
+        for line_number, line in enumerate(lines):
+            if line_number == position:
+                break
+        else:
+            return None
+    article = json.loads(line)
+    pointer = article.pop('_content', None)
+    if pointer is not None:
+        offset, size, _ = pointer
+        with open(snapshot_base(path) + CONTENT_SUFFIX, 'rb') as blob:
+            blob.seek(offset)
+            article['full_content'] = zlib.decompress(blob.read(size)).decode('utf-8')
+    return article
+
+def convert(json_path, remove=False):
+    """
+    Convert a legacy .json snapshot to the compact format.
+
+    The new files keep the modification time of the original, so the order
+    of snapshots is unchanged.
+
+    Args:
+        json_path (str): Path of the legacy snapshot
+        remove (bool): Delete the legacy file once the copy has been verified
+
+    Returns:
+        str: Path of the compact snapshot
+    """
+    articles = load_articles(json_path)
+    compact_path = snapshot_base(json_path) + COMPACT_SUFFIX
+    write_snapshot(compact_path, articles)
+
+    if load_articles(compact_path) != articles:
+        raise ValueError(f"Converted snapshot {compact_path} does not match {json_path}")
+
+    mtime = os.path.getmtime(json_path)
+    for path in (compact_path, snapshot_base(json_path) + CONTENT_SUFFIX):
+        os.utime(path, (mtime, mtime))
+
+    old_size = os.path.getsize(json_path)
+    new_size = os.path.getsize(compact_path) + os.path.getsize(snapshot_base(json_path) + CONTENT_SUFFIX)
+    print(f"{json_path}: {old_size} -> {new_size} bytes")
+
+    if remove:
+        os.remove(json_path)
+    return compact_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert legacy JSON snapshots to the compact format")
+    parser.add_argument('paths', nargs='*', help="Snapshots to convert (defaults to scrapes/*.json)")
+    parser.add_argument('--remove', action='store_true', help="Delete each JSON file after a verified conversion")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join('scrapes', '*' + LEGACY_SUFFIX)))
+    for path in paths:
+        # Skip sidecars (.emb.json, .meta.json) and snapshots that are already compact
+        if not path.endswith(LEGACY_SUFFIX) or not is_snapshot_file(os.path.basename(path)):
+            continue
+        convert(path, remove=args.remove)
@@ -0,0 +1,117 @@
+"""
+Search result snippets with highlight offsets.
+
+Instead of the whole full_content, a search result can carry a short window
+of text around the first match of the query terms, plus the [start, end)
+character offsets of every matched term inside that window so the client
+can highlight them.
+
+Matches are located with the token offsets kept by the snapshot's
+InvertedIndex (InvertedIndex.field_offsets), so building a snippet never
+rescans the article text with a regex.
+"""
+import numpy as np
+from fetch_state import is_extracted_content
+
+SNIPPET_LENGTH = 200        # Maximum snippet length in characters, without ellipses
+SNIPPET_CONTEXT = 60        # Characters kept before the first match
+SNIPPET_FIELDS = ('full_content', 'summary')
+ELLIPSIS = '...'
+
+def _term_hits(ids, term_ids):
+    if not term_ids or not len(ids):
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.isin(ids, term_ids))
+
+def make_snippet(text, ids, starts, ends, term_ids, length=SNIPPET_LENGTH):
+    """
+    Cut a window of text around the first matching token.
+
+    The window starts at a token boundary up to SNIPPET_CONTEXT characters
+    before the first match (or at the start of the text without a match)
+    and ends at the last token boundary within length characters.
+
+    Args:
+        text (str): Field text
+        ids (numpy.ndarray): Token ids of the text, in order
+        starts (numpy.ndarray): Start offset of each token
+        ends (numpy.ndarray): End offset of each token
+        term_ids (list): Token ids of the query terms
+        length (int): Maximum window length
+
+    Returns:
+        dict: "text" of the snippet, with '...' where it was cut, and
+              "highlights", a list of [start, end) offsets into it
+    """
+    if not len(starts):
+        return {"text": text[:length] + (ELLIPSIS if len(text) > length else ''), "highlights": []}
+
+    hits = _term_hits(ids, term_ids)
+    first_token = 0
+    if hits.size:
+        first_token = int(np.searchsorted(starts, starts[hits[0]] - SNIPPET_CONTEXT))
+    begin = 0 if first_token == 0 else int(starts[first_token])
+
+    last_token = int(np.searchsorted(ends, begin + length, side='right')) - 1
+    if last_token == len(ends) - 1 and len(text) - begin <= length:
+        end = len(text)
+    elif last_token >= first_token:
+        end = int(ends[last_token])
+    else:
+        # A single token longer than the window
+        end = begin + length
+
+    prefix = ELLIPSIS if begin > 0 else ''
+    suffix = ELLIPSIS if end < len(text) else ''
+    shift = len(prefix) - begin
+    highlights = [
+        [int(start) + shift, int(stop) + shift]
+        for start, stop in zip(starts[hits], ends[hits])
+        if start >= begin and stop <= end
+    ]
+    return {"text": prefix + text[begin:end] + suffix, "highlights": highlights}
+
+def highlight_offsets(index, doc_id, field, terms):
+    """
+    Return the [start, end) offsets of the query terms in one field of a document
+    """
+    offsets = index.field_offsets(field)
+    ids, starts, ends = offsets.document(doc_id)
+    hits = _term_hits(ids, offsets.term_ids(terms))
+    return [[int(starts[hit]), int(ends[hit])] for hit in hits]
+
+def build_snippet(snapshot, doc_id, terms):
+    """
+    Build the snippet of a search result.
+
+    The first field of SNIPPET_FIELDS that contains a query term is used.
+    Without any match (e.g. the article matched on its title only), the
+    snippet is the start of the first field that has text. Failed
+    extractions stored as full_content are skipped.
+
+    Args:
+        snapshot (Snapshot): Snapshot holding the article
+        doc_id (int): Document id of the article in the snapshot
+        terms (list): Lowercase query tokens
+
+    Returns:
+        dict: "field" the snippet was taken from, "text" and "highlights",
+              or None when the article has no text to show
+    """
+    fallback = None
+    for field in SNIPPET_FIELDS:
+        text = str(snapshot.index.field_value(doc_id, field) or '')
+        if not text or (field == 'full_content' and not is_extracted_content(text)):
+            continue
+        offsets = snapshot.index.field_offsets(field)
+        ids, starts, ends = offsets.document(doc_id)
+        term_ids = offsets.term_ids(terms)
+        if _term_hits(ids, term_ids).size:
+            return dict(make_snippet(text, ids, starts, ends, term_ids), field=field)
+        if fallback is None:
+            fallback = (field, text, ids, starts, ends)
+
+    if fallback is None:
+        return None
+    field, text, ids, starts, ends = fallback
+    return dict(make_snippet(text, ids, starts, ends, []), field=field)
@@ -0,0 +1,51 @@
+"""
+Atomic persistence for the state kept next to the snapshots between runs
+(dedup.py, fetch_state.py and stories.py).
+
+A state file is written to a temporary file first and moved into place, so
+a reader never sees a partial file. A file that cannot be read is reported
+and the caller starts from an empty state.
+"""
+import os
+
+# Errors that mean a state file is missing, truncated or from another version
+READ_ERRORS = (OSError, ValueError, KeyError, EOFError)
+
+def write_atomically(path, write):
+    """
+    Write a state file through a temporary file.
+
+    Args:
+        path (str): Destination path; its directory is created if needed
+        write (callable): Called with the temporary file, opened in binary mode
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+def read_state(path, read, description):
+    """
+    Read a state file, reporting instead of raising when it is unreadable.
+
+    Args:
+        path (str): Path of the state file
+        read (callable): Called with the file, opened in binary mode
+        description (str): What the file holds, for the error message
+
+    Returns:
+        bool: True if read returned without error
+    """
+    try:
+        with open(path, 'rb') as f:
+            read(f)
+        return True
+    except READ_ERRORS as e:
+        print(f"Error loading {description} {path}: {e}")
+        return False
@@ -0,0 +1,333 @@
+"""
+Incremental story clustering across scrape runs.
+
+After each scrape with precomputed embeddings (scraper.py --embed,
+worker.py --embed), the new articles are assigned to story clusters that
+persist between runs:
+
+1. An article joins the story whose centroid is most similar to it, if
+   that similarity is at least CENTROID_THRESHOLD.
+2. Otherwise it joins the story of its nearest known article, if that
+   similarity is at least NEIGHBOR_THRESHOLD. This catches stories whose
+   articles drift away from the centroid as they develop.
+3. Otherwise it starts a new story. Later articles of the same scrape can
+   join it when they are similar enough to the article that started it.
+
+Stories keep the id they were created with ("story_<n>") for as long as
+they are retained, so clients can follow them across requests. Each story
+stores the sum of its members' unit vectors, so its centroid is updated
+without revisiting old articles.
+
+The state (story centroids, member vectors and the few member fields that
+/stories shows) is saved to scrapes/stories.npz. Stories that gain no new
+article for RETENTION_SECONDS are dropped, as are the oldest members beyond
+MAX_TRACKED_ARTICLES. /stories serves it without any request-time clustering.
+"""
+import os
+import time
+import numpy as np
+from article_store import article_id
+from cluster import normalize_rows
+from state_file import read_state, write_atomically
+
+CENTROID_THRESHOLD = 0.7        # Cosine similarity, the same as eps=0.3 in cluster_articles
+NEIGHBOR_THRESHOLD = 0.75
+RETENTION_SECONDS = 7 * 24 * 3600
+MAX_TRACKED_ARTICLES = 20000
+BLOCK_SIZE = 256                # New articles compared with the known ones per matrix product
+DEFAULT_STATE_PATH = os.path.join('scrapes', 'stories.npz')
+
+MEMBER_FIELDS = ('title', 'source', 'published_date')
+
+def format_timestamp(seconds):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+
+class StoryIndex:
+    """
+    Persistent story clusters with stable ids.
+
+    Attributes:
+        path (str): File the state is loaded from and saved to, or None
+        next_id (int): Number of the next story that is created
+    """
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.next_id = 0
+        self._stories = {}      # story number -> {"title", "sum", "count", "created", "updated"}
+        self._members = {}      # link -> {"story", "vector", "seen", MEMBER_FIELDS...}
+        self._centroids = None  # (story numbers, unit centroid matrix), rebuilt when stale
+        self._neighbors = None  # (member links, unit vector matrix), rebuilt when stale
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._stories)
+
+    def _invalidate(self):
+        self._centroids = None
+        self._neighbors = None
+
+    def _centroid_matrix(self):
+        if self._centroids is None:
+            numbers = list(self._stories)
+            sums = [self._stories[number]['sum'] for number in numbers]
+            self._centroids = (numbers, normalize_rows(sums) if sums else np.zeros((0, 0), dtype=np.float32))
+        return self._centroids
+
+    def _neighbor_matrix(self):
+        if self._neighbors is None:
+            links = list(self._members)
+            vectors = [self._members[link]['vector'] for link in links]
+            self._neighbors = (links, np.array(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), dtype=np.float32))
+        return self._neighbors
+
+    def _match_known(self, vectors):
+        """
+        Find the existing story of each new vector, or -1
+        """
+        numbers, centroids = self._centroid_matrix()
+        links, neighbors = self._neighbor_matrix()
+        stories = np.full(len(vectors), -1, dtype=np.int64)
+        if not numbers:
+            return stories
+
+        for start in range(0, len(vectors), BLOCK_SIZE):
+            block = vectors[start:start + BLOCK_SIZE]
+            similarities = block @ centroids.T
+            best = similarities.argmax(axis=1)
+            for row, column in enumerate(best):
+                if similarities[row, column] >= CENTROID_THRESHOLD:
+                    stories[start + row] = numbers[column]
+
+            unmatched = np.flatnonzero(stories[start:start + len(block)] < 0)
+            if len(unmatched) and len(links):
+                similarities = block[unmatched] @ neighbors.T
+                nearest = similarities.argmax(axis=1)
+                for position, (row, column) in enumerate(zip(unmatched, nearest)):
+                    if similarities[position, column] >= NEIGHBOR_THRESHOLD:
+                        stories[start + row] = self._members[links[column]]['story']
+        return stories
+
+    def _new_story(self, title, now):
+        number = self.next_id
+        self.next_id += 1
+        self._stories[number] = {"title": title, "sum": None, "count": 0, "created": now, "updated": now}
+        return number
+
+    def _add_member(self, number, article, vector, now):
+        story = self._stories[number]
+        story['sum'] = vector.copy() if story['sum'] is None else story['sum'] + vector
+        story['count'] += 1
+        story['updated'] = now
+        member = {"story": number, "vector": vector, "seen": now}
+        for field in MEMBER_FIELDS:
+            member[field] = str(article.get(field, '') or '')
+        self._members[article['link']] = member
+
+    def update(self, articles, vectors, now=None):
+        """
+        Assign new articles to stories.
+
+        Articles that are already members keep their story and are only
+        marked as seen.
+
+        Args:
+            articles (list): Articles of a scrape
+            vectors (numpy.ndarray): Embedding of each article, one row per article
+            now (float, optional): Unix time of the scrape
+
+        Returns:
+            dict: Number of articles "assigned" to existing stories and of "created" stories
+        """
+        now = now if now is not None else time.time()
+        new, new_links = [], set()
+        for idx, article in enumerate(articles):
+            link = article.get('link', '')
+            if not link:
+                continue
+            if link in self._members:
+                self._members[link]['seen'] = now
+            elif link not in new_links:
+                new.append(idx)
+                new_links.add(link)
+        if not new:
+            return {"assigned": 0, "created": 0}
+
+        unit = normalize_rows(np.asarray(vectors)[new])
+        known = self._match_known(unit)
+
+        assigned = created = 0
+        # Articles that match no known story are grouped with each other
+        leaders, leader_numbers = [], []
+        for row, idx in enumerate(new):
+            number = int(known[row])
+            if number >= 0:
+                assigned += 1
+            else:
+                if leaders:
+                    similarities = np.array(leaders) @ unit[row]
+                    best = int(similarities.argmax())
+                    if similarities[best] >= CENTROID_THRESHOLD:
+                        number = leader_numbers[best]
+                if number < 0:
+                    number = self._new_story(str(articles[idx].get('title', '') or ''), now)
+                    leaders.append(unit[row])
+                    leader_numbers.append(number)
+                    created += 1
+            self._add_member(number, articles[idx], unit[row], now)
+
+        self._invalidate()
+        return {"assigned": assigned, "created": created}
+
+    def prune(self, now=None):
+        """
+        Drop stories without a new article within RETENTION_SECONDS and the
+        members of dropped stories, then the least recently seen members
+        beyond MAX_TRACKED_ARTICLES. A story keeps its centroid when some of
+        its old members are dropped.
+        """
+        now = now if now is not None else time.time()
+        self._stories = {
+            number: story for number, story in self._stories.items()
+            if now - story['updated'] <= RETENTION_SECONDS
+        }
+        members = sorted(
+            (item for item in self._members.items() if item[1]['story'] in self._stories),
+            key=lambda item: item[1]['seen'],
+            reverse=True
+        )
+        self._members = dict(members[:MAX_TRACKED_ARTICLES])
+        self._invalidate()
+
+    def stories(self, min_size=2, offset=0, limit=None):
+        """
+        Return stories with their articles, most recently updated first.
+
+        Args:
+            min_size (int): Leave out stories with fewer retained articles
+            offset (int): Number of stories to skip
+            limit (int, optional): Maximum number of stories to return
+
+        Returns:
+            tuple: (total, stories) where total counts every story of at least
+                   min_size articles
+        """
+        grouped = {}
+        for link, member in self._members.items():
+            grouped.setdefault(member['story'], []).append((link, member))
+
+        ranked = sorted(
+            (number for number, members in grouped.items() if len(members) >= min_size),
+            key=lambda number: (self._stories[number]['updated'], len(grouped[number])),
+            reverse=True
+        )
+        page = ranked[offset:] if limit is None else ranked[offset:offset + limit]
+
+        result = []
+        for number in page:
+            story = self._stories[number]
+            members = sorted(grouped[number], key=lambda item: item[1]['seen'], reverse=True)
+            articles = [
+                dict({field: member[field] for field in MEMBER_FIELDS}, link=link, article_id=article_id(link))
+                for link, member in members
+            ]
+            sources = list(dict.fromkeys(article['source'] for article in articles))
+            result.append({
+                "story_id": f"story_{number}",
+                "title": story['title'],
+                "size": len(articles),
+                "sources": sources,
+                "created": format_timestamp(story['created']),
+                "updated": format_timestamp(story['updated']),
+                "articles": articles
+            })
+        return len(ranked), result
+
+    def save(self):
+        """
+        Save the stories and their members as a compressed .npz file.
+        Member vectors are stored as float16.
+        """
+        numbers = list(self._stories)
+        links = list(self._members)
+        members = [self._members[link] for link in links]
+        dimensions = len(members[0]['vector']) if members else 0
+        write_atomically(
+            self.path,
+            lambda f: np.savez_compressed(
+                f,
+                next_id=np.array([self.next_id], dtype=np.int64),
+                story_numbers=np.array(numbers, dtype=np.int64),
+                story_titles=np.array([self._stories[number]['title'] for number in numbers], dtype=str),
+                story_sums=np.array([self._stories[number]['sum'] for number in numbers], dtype=np.float32).reshape(len(numbers), dimensions),
+                story_counts=np.array([self._stories[number]['count'] for number in numbers], dtype=np.int64),
+                story_created=np.array([self._stories[number]['created'] for number in numbers], dtype=np.float64),
+                story_updated=np.array([self._stories[number]['updated'] for number in numbers], dtype=np.float64),
+                member_links=np.array(links, dtype=str),
+                member_stories=np.array([member['story'] for member in members], dtype=np.int64),
+                member_vectors=np.array([member['vector'] for member in members], dtype=np.float16).reshape(len(members), dimensions),
+                member_seen=np.array([member['seen'] for member in members], dtype=np.float64),
+                **{f"member_{field}": np.array([member[field] for member in members], dtype=str) for field in MEMBER_FIELDS}
+            )
+        )
+
+    def load(self):
+        """
+        Load the stories and members saved by save
+        """
+        def read(f):
+            with np.load(f) as state:
+                self.next_id = int(state['next_id'][0])
+                self._stories = {
+                    int(number): {
+                        "title": str(title), "sum": total, "count": int(count),
+                        "created": float(created), "updated": float(updated)
+                    }
+                    for number, title, total, count, created, updated in zip(
+                        state['story_numbers'], state['story_titles'], state['story_sums'],
+                        state['story_counts'], state['story_created'], state['story_updated']
+                    )
+                }
+                fields = [state[f"member_{field}"] for field in MEMBER_FIELDS]
+                self._members = {}
+                for row, link in enumerate(state['member_links']):
+                    member = {
+                        "story": int(state['member_stories'][row]),
+                        "vector": state['member_vectors'][row].astype(np.float32),
+                        "seen": float(state['member_seen'][row])
+                    }
+                    for field, values in zip(MEMBER_FIELDS, fields):
+                        member[field] = str(values[row])
+                    self._members[str(link)] = member
+        read_state(self.path, read, 'story state')
+        self._invalidate()
+
+def update_stories(articles, vectors, path=DEFAULT_STATE_PATH):
+    """
+    Assign the articles of a scrape to stories, then prune and save the state
+
+    Returns:
+        dict: Counts of assigned articles and created stories
+    """
+    index = StoryIndex(path)
+    counts = index.update(articles, vectors)
+    index.prune()
+    index.save()
+    print(f"Stories: {counts['assigned']} articles joined existing stories, {counts['created']} new stories, {len(index)} retained")
+    return counts
+
+_loaded = None
+
+def current_stories(path=DEFAULT_STATE_PATH):
+    """
+    Return the StoryIndex saved at path, reloading it when the file changes,
+    or None if no story state has been saved yet
+    """
+    global _loaded
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _loaded is None or _loaded[0] != (path, mtime):
+        _loaded = ((path, mtime), StoryIndex(path))
+    return _loaded[1]
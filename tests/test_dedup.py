@@ -0,0 +1,56 @@
+from dedup import DuplicateDetector, article_shingles, collapse_duplicates, minhash_signature
+
+CONTENT = (
+    "The state election commission announced on Monday that polling for the municipal "
+    "elections will be held in three phases next month, with counting scheduled for the "
+    "first week of March. Officials said more than two million voters are expected to "
+    "take part and that additional security forces will be deployed at sensitive booths "
+    "across the districts."
+)
+
+def make_article(link, source, title, content=CONTENT):
+    return {
+        "title": title,
+        "link": link,
+        "summary": "Municipal polls will be held in three phases next month.",
+        "full_content": content,
+        "source": source,
+    }
+
+def test_near_duplicates_with_different_links_are_merged():
+    articles = [
+        make_article("https://a.example/polls-1", "a.example", "Municipal elections to be held in three phases"),
+        make_article("https://b.example/story/42", "b.example", "Municipal elections to be held in three phases next month",
+                     CONTENT.replace("Monday", "Tuesday")),
+    ]
+    collapsed = collapse_duplicates(articles, DuplicateDetector(path=None))
+
+    assert len(collapsed) == 1
+    assert collapsed[0]["link"] == "https://a.example/polls-1"
+    assert collapsed[0]["alternate_links"] == ["https://b.example/story/42"]
+    assert collapsed[0]["alternate_sources"] == ["b.example"]
+
+def test_unrelated_articles_are_kept_apart():
+    articles = [
+        make_article("https://a.example/polls-1", "a.example", "Municipal elections to be held in three phases"),
+        make_article("https://b.example/cricket", "b.example", "India win the third test by six wickets",
+                     "India beat England by six wickets on the final day of the third test, chasing down "
+                     "a target of 245 runs with more than a session to spare after a century from the "
+                     "captain. The series now stands level at one all with two matches left to play in "
+                     "the tour, which ends next month."),
+    ]
+    collapsed = collapse_duplicates(articles, DuplicateDetector(path=None))
+
+    assert [article["link"] for article in collapsed] == ["https://a.example/polls-1", "https://b.example/cricket"]
+    assert all("alternate_links" not in article for article in collapsed)
+
+def test_copy_in_a_later_scrape_maps_to_the_saved_canonical_article(tmp_path):
+    path = str(tmp_path / "dedup_state.npz")
+    detector = DuplicateDetector(path)
+    collapse_duplicates([make_article("https://a.example/polls-1", "a.example",
+                                      "Municipal elections to be held in three phases")], detector)
+    detector.save()
+
+    copy = make_article("https://b.example/story/42", "b.example", "Municipal elections to be held in three phases next month")
+    signature = minhash_signature(article_shingles(copy))
+    assert DuplicateDetector(path).canonical_link(copy, signature) == "https://a.example/polls-1"
@@ -0,0 +1,212 @@
+"""
+Standalone scraper worker.
+
+Runs the scraper in its own process so the web server only has to pick up
+the snapshots it writes (the article store watches the scrapes directory).
+
+Every feed is polled on its own schedule. The interval adapts to how often
+the feed actually publishes: it shrinks towards MIN_INTERVAL while new
+entries keep arriving and grows towards MAX_INTERVAL while they do not.
+Feeds that fail (network errors, unparseable responses) back off
+exponentially, and after CIRCUIT_BREAKER_THRESHOLD consecutive failures
+their circuit opens and they are only probed every CIRCUIT_OPEN_SECONDS.
+
+Whenever a round of polling finds new entries, a full snapshot with the
+latest entries of every feed is written. Since that can happen every few
+minutes, snapshots older than the retention window (7 days by default) or
+beyond the newest MAX_RETAINED_SNAPSHOTS are deleted with their sidecars
+after each write.
+
+Usage:
+    python worker.py
+    python worker.py --embed --once
+    python worker.py --retention-days 2
+    python worker.py --metrics-port 9101
+
+The scraper metrics (feed fetch and parse times, bytes downloaded, articles
+scraped) are recorded in this process, so the worker serves them at
+http://localhost:<metrics-port>/metrics instead of the web server.
+"""
+import argparse
+import time
+from fetch_state import FetchState
+from metrics import timed, serve as serve_metrics
+from article_store import SNAPSHOT_RETENTION_SECONDS
+from scraper import RSS_FEED_URLS, fetch_feeds, fill_full_content, prune_old_snapshots, save_fetch_state, save_snapshot
+
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 2 * 3600
+DEFAULT_INTERVAL = 30 * 60
+TARGET_NEW_ENTRIES = 5          # Aim to find about this many new entries per poll
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 6 * 3600
+MAX_SLEEP = 60
+DEFAULT_METRICS_PORT = 9101
+
+class FeedSchedule:
+    """
+    Polling schedule and health of a single feed.
+
+    Attributes:
+        url (str): Feed URL
+        interval (float): Seconds between polls while the feed is healthy
+        next_due (float): Unix time of the next poll
+        failures (int): Consecutive failed polls
+        links (set): Links of the entries seen in the last successful poll
+        last_success (float): Unix time of the last successful poll, or None
+    """
+    def __init__(self, url, interval=DEFAULT_INTERVAL):
+        self.url = url
+        self.interval = interval
+        self.next_due = 0.0
+        self.failures = 0
+        self.links = set()
+        self.last_success = None
+
+    def is_due(self, now):
+        return now >= self.next_due
+
+    @property
+    def circuit_open(self):
+        return self.failures >= CIRCUIT_BREAKER_THRESHOLD
+
+    def record_success(self, links, now):
+        """
+        Adapt the interval to the number of new entries since the last poll.
+
+        Returns:
+            int: Number of new entries
+        """
+        new_entries = len(set(links) - self.links) if self.last_success is not None else len(links)
+        if self.last_success is not None:
+            if new_entries:
+                # Poll often enough to see about TARGET_NEW_ENTRIES new entries each time
+                estimate = (now - self.last_success) * TARGET_NEW_ENTRIES / new_entries
+                self.interval = (self.interval + estimate) / 2
+            else:
+                self.interval *= 1.5
+            self.interval = min(MAX_INTERVAL, max(MIN_INTERVAL, self.interval))
+
+        self.links = set(links)
+        self.last_success = now
+        self.failures = 0
+        self.next_due = now + self.interval
+        return new_entries
+
+    def record_failure(self, now):
+        """
+        Back off exponentially, or open the circuit after repeated failures
+        """
+        self.failures += 1
+        if self.circuit_open:
+            delay = CIRCUIT_OPEN_SECONDS
+        else:
+            delay = min(MAX_INTERVAL, MIN_INTERVAL * 2 ** self.failures)
+        self.next_due = now + delay
+        return delay
+
+class ScrapeWorker:
+    """
+    Polls feeds on their own schedules and writes snapshots when they change.
+
+    Args:
+        feed_urls (list): Feeds to poll
+        precompute_embeddings (bool): Embed every snapshot after saving it
+        embedding_dtype (str): 'float32' or 'float16' for the embeddings
+        retention_seconds (float): Age after which snapshots are deleted
+    """
+    def __init__(self, feed_urls=RSS_FEED_URLS, precompute_embeddings=False, embedding_dtype='float32',
+                 retention_seconds=SNAPSHOT_RETENTION_SECONDS):
+        self.schedules = {url: FeedSchedule(url) for url in feed_urls}
+        self.precompute_embeddings = precompute_embeddings
+        self.embedding_dtype = embedding_dtype
+        self.retention_seconds = retention_seconds
+        self.state = FetchState()
+        self.feed_articles = {}     # feed url -> articles of its last successful poll
+
+    def poll_due_feeds(self, now=None):
+        """
+        Poll every feed that is due, concurrently.
+
+        Returns:
+            bool: True when any feed has new entries
+        """
+        now = now if now is not None else time.time()
+        changed = False
+        due = [schedule.url for schedule in self.schedules.values() if schedule.is_due(now)]
+        for feed_url, articles, status in fetch_feeds(due, self.state):
+            schedule = self.schedules[feed_url]
+            if status == 'error':
+                delay = schedule.record_failure(now)
+                state = "circuit open" if schedule.circuit_open else "backing off"
+                print(f"Feed failed {schedule.failures} time(s), {state} for {delay / 60:.0f} min: {schedule.url}")
+                continue
+
+            new_entries = schedule.record_success([article['link'] for article in articles], now)
+            self.feed_articles[schedule.url] = articles
+            if new_entries:
+                changed = True
+            print(f"{new_entries} new entries, next poll in {schedule.interval / 60:.0f} min: {schedule.url}")
+        return changed
+
+    def write_snapshot(self):
+        """
+        Fetch the content of new entries, save a full snapshot of every feed
+        and delete the snapshots beyond the retention window
+        """
+        articles = [dict(article) for feed in self.feed_articles.values() for article in feed]
+        with timed('scrape_feeds'):
+            fill_full_content(articles, self.state)
+        save_fetch_state(self.state)
+        filename = save_snapshot(articles, self.precompute_embeddings, self.embedding_dtype)
+        prune_old_snapshots(max_age=self.retention_seconds)
+        return filename
+
+    def run_once(self, now=None):
+        """
+        Poll the due feeds and write a snapshot if anything changed
+        """
+        if self.poll_due_feeds(now):
+            return self.write_snapshot()
+        return None
+
+    def seconds_until_next_poll(self, now=None):
+        now = now if now is not None else time.time()
+        return max(0.0, min(schedule.next_due for schedule in self.schedules.values()) - now)
+
+    def run_forever(self):
+        print(f"Scraper worker polling {len(self.schedules)} feeds")
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in scraper worker: {e}")
+            time.sleep(min(MAX_SLEEP, self.seconds_until_next_poll()) or 1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll RSS feeds and write snapshots to the scrapes directory")
+    parser.add_argument('--embed', action='store_true', help="Precompute article embeddings after each snapshot")
+    parser.add_argument('--float16', action='store_true', help="Store precomputed embeddings as float16")
+    parser.add_argument('--once', action='store_true', help="Poll every feed once, write a snapshot and exit")
+    parser.add_argument('--retention-days', type=float, default=SNAPSHOT_RETENTION_SECONDS / 86400,
+                        help="Delete snapshots older than this many days")
+    parser.add_argument('--metrics-port', type=int, default=DEFAULT_METRICS_PORT,
+                        help="Serve Prometheus metrics at /metrics on this port (0 disables it)")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+        print(f"Serving metrics at http://localhost:{args.metrics_port}/metrics")
+
+    worker = ScrapeWorker(
+        precompute_embeddings=args.embed,
+        embedding_dtype='float16' if args.float16 else 'float32',
+        retention_seconds=args.retention_days * 86400
+    )
+    try:
+        if args.once:
+            worker.run_once()
+        else:
+            worker.run_forever()
+    except KeyboardInterrupt:
+        print("Scraper worker stopped")